@@ -1,3 +1,12 @@
+import copy
+import heapq
+import math
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import tkinter as tk
 from tkinter import ttk, simpledialog, messagebox, filedialog, Button
@@ -9,21 +18,44 @@ import webbrowser
 
 
 class TransportationProblem:
-    def __init__(self, num_supply_nodes, num_demand_nodes, supply_values, demand_values, transportation_costs):
+    IFS_METHODS = {
+        "NWCR": "northwest_corner_rule",
+        "MCR": "minimum_cost_rule",
+        "VA": "vogel_approximation_method",
+        "RA": "russell_approximation_method",
+        "RMR": "row_minimum_rule",
+        "CMR": "column_minimum_rule",
+    }
+
+    def __init__(self, num_supply_nodes, num_demand_nodes, supply_values, demand_values, transportation_costs,
+                 dtype=None, tolerance=None):
         self.num_supply_nodes = num_supply_nodes
         self.num_demand_nodes = num_demand_nodes
         self.supply_values = supply_values
         self.demand_values = demand_values
         self.transportation_costs = transportation_costs
-        self.allocations = np.zeros((num_supply_nodes, num_demand_nodes), dtype=int)
+        # Numeric mode (see numeric_mode): exact int64 or float64 with tolerance-aware comparisons
+        self.dtype = numeric_mode(dtype, supply_values, demand_values, transportation_costs)
+        self.tolerance = tolerance
+        self.allocations = np.zeros((num_supply_nodes, num_demand_nodes), dtype=self.dtype)
 
         # initialize u_values and v_values
-        self.u_values = np.zeros(num_supply_nodes, dtype=int)
-        self.v_values = np.zeros(num_demand_nodes, dtype=int)
+        self.u_values = np.zeros(num_supply_nodes, dtype=self.dtype)
+        self.v_values = np.zeros(num_demand_nodes, dtype=self.dtype)
 
+        # index of the balancing node added by balance_problem, if any
+        self.dummy_supply_node = None
+        self.dummy_demand_node = None
         self.balance_problem()
-        self.allocations = np.zeros((self.num_supply_nodes, self.num_demand_nodes), dtype=int)
+        self.cost_matrix = np.array(self.transportation_costs, dtype=self.dtype)
+        self.allocations = np.zeros((self.num_supply_nodes, self.num_demand_nodes), dtype=self.dtype)
+        self.cost_tolerance = comparison_tolerance(self.dtype, tolerance, self.cost_matrix)
+        self.flow_tolerance = comparison_tolerance(self.dtype, tolerance, self.supply_values + self.demand_values)
+        # basic cells, kept explicitly so zero-valued (degenerate) basic cells stay in the basis
+        self.basis = set()
         self.iteration = 0
+        # pivot log started by start_history(), see IterationHistory
+        self.history = None
 
     def balance_problem(self):
         total_supply = sum(self.supply_values)
@@ -31,17 +63,21 @@ class TransportationProblem:
 
         if total_supply != total_demand:
             if total_supply > total_demand:
+                self.dummy_demand_node = self.num_demand_nodes
                 self.num_demand_nodes += 1
                 self.demand_values.append(total_supply - total_demand)
                 for i, row in enumerate(self.transportation_costs):
                     self.transportation_costs[i] = np.append(row, 0)
-                self.allocations = np.append(self.allocations, np.zeros((self.num_supply_nodes, 1)), axis=1)
+                self.allocations = np.append(self.allocations, np.zeros((self.num_supply_nodes, 1), dtype=self.dtype),
+                                             axis=1)
             else:
+                self.dummy_supply_node = self.num_supply_nodes
                 self.num_supply_nodes += 1
                 self.supply_values.append(total_demand - total_supply)
-                new_row = np.array([0] * self.num_demand_nodes)
+                new_row = np.zeros(self.num_demand_nodes, dtype=self.dtype)
                 self.transportation_costs.append(new_row)
-                self.allocations = np.append(self.allocations, np.zeros((1, self.num_demand_nodes)), axis=0)
+                self.allocations = np.append(self.allocations, np.zeros((1, self.num_demand_nodes), dtype=self.dtype),
+                                             axis=0)
 
     def northwest_corner_rule(self): 
         i = j = 0
@@ -50,6 +86,7 @@ class TransportationProblem:
         while i < self.num_supply_nodes and j < self.num_demand_nodes:
             allocation = min(remaining_supply[i], remaining_demand[j])
             self.allocations[i, j] = allocation
+            self.basis.add((i, j))
             remaining_supply[i] -= allocation
             remaining_demand[j] -= allocation
 
@@ -60,190 +97,2418 @@ class TransportationProblem:
             else:
                 break
 
+        self.complete_basis()
+
     def minimum_cost_rule(self):
-        remaining_supply = self.supply_values.copy()
-        remaining_demand = self.demand_values.copy()
-        costs = np.array(self.transportation_costs, dtype=float)
+        # Cells are sorted by cost once (stable, so ties keep row-major order like np.argmin) and swept in that
+        # order, skipping cells whose row or column is already exhausted
+        remaining_supply = np.array(self.supply_values)
+        remaining_demand = np.array(self.demand_values)
+        costs = self.cost_matrix.astype(float)
+        rows, columns = np.divmod(np.argsort(costs, axis=None, kind="stable"), self.num_demand_nodes)
+        row_open = np.ones(self.num_supply_nodes, dtype=bool)
+        column_open = np.ones(self.num_demand_nodes, dtype=bool)
+
+        position = 0
+        while remaining_supply.any() and remaining_demand.any():
+            # find the next cell with both lines open, scanning windows that double in size
+            window = 64
+            while True:
+                hits = np.flatnonzero(row_open[rows[position:position + window]] &
+                                      column_open[columns[position:position + window]])
+                if len(hits):
+                    position += hits[0]
+                    break
+                position += window
+                window *= 2
+            i, j = int(rows[position]), int(columns[position])
+            position += 1
 
-        while any(remaining_supply) and any(remaining_demand):
-            min_cost_index = np.unravel_index(np.argmin(costs, axis=None), costs.shape)
-            allocation = min(remaining_supply[min_cost_index[0]], remaining_demand[min_cost_index[1]])
-            self.allocations[min_cost_index] = allocation
-            remaining_supply[min_cost_index[0]] -= allocation
-            remaining_demand[min_cost_index[1]] -= allocation
+            allocation = min(remaining_supply[i], remaining_demand[j])
+            self.allocations[i, j] = allocation
+            self.basis.add((i, j))
+            remaining_supply[i] -= allocation
+            remaining_demand[j] -= allocation
 
-            if remaining_supply[min_cost_index[0]] == 0:
-                costs[min_cost_index[0], :] = np.finfo(float).max
-            if remaining_demand[min_cost_index[1]] == 0:
-                costs[:, min_cost_index[1]] = np.finfo(float).max
+            if remaining_supply[i] == 0:
+                row_open[i] = False
+            if remaining_demand[j] == 0:
+                column_open[j] = False
 
-            if remaining_supply[min_cost_index[0]] == 0 and remaining_demand[min_cost_index[1]] == 0:
-                costs[min_cost_index[0], :] = np.finfo(float).max
-                costs[:, min_cost_index[1]] = np.finfo(float).max
+        self.complete_basis()
 
     def vogel_approximation_method(self):
+        # Incremental VAM: every line keeps its cells sorted by cost once, plus pointers to its two cheapest open
+        # cells, and the penalties sit in a heap. An allocation only reprices the lines whose two cheapest cells
+        # lost a closed row/column. Ties go as in the textbook loop: highest penalty, rows before columns, lower
+        # index first, cheapest cell with the lower index first. A closed line counts as the float max sentinel,
+        # so a line with a single open cell has penalty float max - cost.
+        num_supply_nodes, num_demand_nodes = self.num_supply_nodes, self.num_demand_nodes
         remaining_supply = self.supply_values.copy()
         remaining_demand = self.demand_values.copy()
-        costs = np.array(self.transportation_costs, dtype=float)
+        costs = self.cost_matrix.astype(float)
+        closed = np.finfo(float).max
+
+        # Sorted cell orders per line, padded with an index that is never open
+        row_order = np.argsort(costs, axis=1, kind="stable")
+        row_order = np.hstack([row_order, np.full((num_supply_nodes, 2), num_demand_nodes)])
+        column_order = np.argsort(costs, axis=0, kind="stable").T
+        column_order = np.hstack([column_order, np.full((num_demand_nodes, 2), num_supply_nodes)])
+        row_open = np.append(np.ones(num_supply_nodes, dtype=bool), False)
+        column_open = np.append(np.ones(num_demand_nodes, dtype=bool), False)
+        # positions (in the sorted order) of the cheapest and second cheapest open cell of every line
+        row_first, row_second = np.zeros(num_supply_nodes, dtype=int), np.ones(num_supply_nodes, dtype=int)
+        column_first, column_second = np.zeros(num_demand_nodes, dtype=int), np.ones(num_demand_nodes, dtype=int)
+
+        def advance(order, is_open, first, second, k):
+            # the two cheapest open cells from first[k] on; missing ones point at the padding
+            found = first[k] + np.flatnonzero(is_open[order[k, first[k]:-2]])[:2]
+            first[k] = found[0] if len(found) > 0 else len(order[k]) - 2
+            second[k] = found[1] if len(found) > 1 else len(order[k]) - 1
+
+        def penalty(line_costs, order, is_open, first, second, k):
+            if len(line_costs) < 2:
+                return 0.0
+            cheapest = line_costs[order[k, first[k]]] if is_open[order[k, first[k]]] else closed
+            next_cheapest = line_costs[order[k, second[k]]] if is_open[order[k, second[k]]] else closed
+            return next_cheapest - cheapest
+
+        # heap of (-penalty, line) with rows as lines 0..m-1 and columns as m..m+n-1; entries go stale and are
+        # skipped when the line closes or its penalty changes
+        penalties = np.full(num_supply_nodes + num_demand_nodes, np.nan)
+        heap = []
+
+        def push_row(i):
+            if remaining_supply[i] > 0:
+                penalties[i] = penalty(costs[i], row_order, column_open, row_first, row_second, i)
+                heapq.heappush(heap, (-penalties[i], i))
+
+        def push_column(j):
+            if remaining_demand[j] > 0:
+                line = num_supply_nodes + j
+                penalties[line] = penalty(costs[:, j], column_order, row_open, column_first, column_second, j)
+                heapq.heappush(heap, (-penalties[line], line))
+
+        for i in range(num_supply_nodes):
+            push_row(i)
+        for j in range(num_demand_nodes):
+            push_column(j)
 
         while any(remaining_supply) and any(remaining_demand):
-            penalty_costs = []
-
-            for i in range(self.num_supply_nodes):
-                if remaining_supply[i] > 0:
-                    row = costs[i, :]
-                    smallest_cost, next_smallest_cost = np.partition(row, 2)[:2]
-                    penalty_costs.append((next_smallest_cost - smallest_cost, i, -1))
-                else:
-                    penalty_costs.append((np.finfo(float).min, i, -1))
-
-            for j in range(self.num_demand_nodes):
-                if remaining_demand[j] > 0:
-                    column = costs[:, j]
-                    smallest_cost, next_smallest_cost = np.partition(column, 2)[:2]
-                    penalty_costs.append((next_smallest_cost - smallest_cost, -1, j))
-                else:
-                    penalty_costs.append((np.finfo(float).min, -1, j))
-
-            max_penalty_cost, max_i, max_j = max(penalty_costs, key=lambda x: x[0])
-            if max_i == -1:
-                i = np.argmin(costs[:, max_j])
-                j = max_j
+            negative_penalty, line = heapq.heappop(heap)
+            if -negative_penalty != penalties[line]:
+                continue
+            if line < num_supply_nodes:
+                i = line
+                j = int(row_order[i, row_first[i]])
             else:
-                i = max_i
-                j = np.argmin(costs[i, :])
+                j = line - num_supply_nodes
+                i = int(column_order[j, column_first[j]])
 
             allocation = min(remaining_supply[i], remaining_demand[j])
             self.allocations[i, j] = allocation
+            self.basis.add((i, j))
             remaining_supply[i] -= allocation
             remaining_demand[j] -= allocation
 
             if remaining_supply[i] == 0:
-                costs[i, :] = np.finfo(float).max
+                row_open[i] = False
+                penalties[i] = np.nan
+                # columns whose two cheapest open cells included row i
+                touched = np.flatnonzero((column_order[np.arange(num_demand_nodes), column_first] == i) |
+                                         (column_order[np.arange(num_demand_nodes), column_second] == i))
+                for k in touched:
+                    advance(column_order, row_open, column_first, column_second, k)
+                    if column_open[k]:
+                        push_column(k)
             if remaining_demand[j] == 0:
-                costs[:, j] = np.finfo(float).max
+                column_open[j] = False
+                penalties[num_supply_nodes + j] = np.nan
+                touched = np.flatnonzero((row_order[np.arange(num_supply_nodes), row_first] == j) |
+                                         (row_order[np.arange(num_supply_nodes), row_second] == j))
+                for k in touched:
+                    advance(row_order, column_open, row_first, row_second, k)
+                    if row_open[k]:
+                        push_row(k)
+
+        self.complete_basis()
+
+    def russell_approximation_method(self):
+        # Russell's rule: with u_i and v_j the largest open cost of each row and column, allocate to the open
+        # cell with the most negative c_ij - u_i - v_j (first in row-major order on ties). As in the heap VAM,
+        # nothing is rebuilt per allocation: u and v keep the line holding their maximum, every open row keeps
+        # its smallest delta, and only the rows and columns that depended on a closing line are rescanned.
+        num_supply_nodes, num_demand_nodes = self.num_supply_nodes, self.num_demand_nodes
+        remaining_supply = np.array(self.supply_values)
+        remaining_demand = np.array(self.demand_values)
+        costs = self.cost_matrix.astype(float)
+        row_open, column_open = remaining_supply > 0, remaining_demand > 0
+
+        open_costs = np.where(row_open[:, np.newaxis] & column_open[np.newaxis, :], costs, -np.inf)
+        u_columns = open_costs.argmax(axis=1)
+        v_rows = open_costs.argmax(axis=0)
+        u_values = open_costs[np.arange(num_supply_nodes), u_columns]
+        v_values = open_costs[v_rows, np.arange(num_demand_nodes)]
+        del open_costs
+        best_deltas = np.full(num_supply_nodes, np.inf)
+        best_columns = np.zeros(num_supply_nodes, dtype=int)
+
+        def rescan(rows):
+            open_columns = np.flatnonzero(column_open)
+            if rows.size and open_columns.size:
+                deltas = costs[np.ix_(rows, open_columns)] - u_values[rows, np.newaxis] - v_values[open_columns]
+                best = deltas.argmin(axis=1)
+                best_deltas[rows] = deltas[np.arange(rows.size), best]
+                best_columns[rows] = open_columns[best]
+
+        rescan(np.flatnonzero(row_open))
+        while row_open.any() and column_open.any():
+            # rows are scanned in order and each keeps its first smallest delta, which gives row-major tie-breaking
+            i = int(best_deltas.argmin())
+            j = int(best_columns[i])
+
+            allocation = min(remaining_supply[i], remaining_demand[j])
+            self.allocations[i, j] = allocation
+            self.basis.add((i, j))
+            remaining_supply[i] -= allocation
+            remaining_demand[j] -= allocation
 
-    def calculate_shadow_prices(self):
-        allocations = self.allocations.copy()
-        transportation_costs = self.transportation_costs
-        num_supply_nodes, num_demand_nodes = allocations.shape
-        u_values = [None] * num_supply_nodes
-        v_values = [None] * num_demand_nodes
+            if remaining_supply[i] <= 0:
+                row_open[i] = False
+                best_deltas[i] = np.inf
+                # v drops only in the columns whose maximum was in row i; their cells now have larger deltas, so
+                # only the rows whose smallest delta was in one of them need a rescan
+                changed = np.flatnonzero(column_open & (v_rows == i))
+                if changed.size:
+                    column_costs = np.where(row_open[:, np.newaxis], costs[:, changed], -np.inf)
+                    v_rows[changed] = column_costs.argmax(axis=0)
+                    v_values[changed] = column_costs[v_rows[changed], np.arange(changed.size)]
+                    rescan(np.flatnonzero(row_open & np.isin(best_columns, changed)))
+            if remaining_demand[j] <= 0:
+                column_open[j] = False
+                changed = np.flatnonzero(row_open & (u_columns == j))
+                if changed.size:
+                    row_costs = np.where(column_open[np.newaxis, :], costs[changed], -np.inf)
+                    u_columns[changed] = row_costs.argmax(axis=1)
+                    u_values[changed] = row_costs[np.arange(changed.size), u_columns[changed]]
+                rescan(np.union1d(changed, np.flatnonzero(row_open & (best_columns == j))))
+
+        self.complete_basis()
+
+    def row_minimum_rule(self):
+        # Rows in order; each row ships to its cheapest columns that still need units until its supply is gone
+        remaining_supply = np.array(self.supply_values)
+        remaining_demand = np.array(self.demand_values)
+        costs = self.cost_matrix.astype(float)
 
+        for i in range(self.num_supply_nodes):
+            while remaining_supply[i] > 0 and remaining_demand.any():
+                j = int(np.argmin(np.where(remaining_demand > 0, costs[i], np.inf)))
+                allocation = min(remaining_supply[i], remaining_demand[j])
+                self.allocations[i, j] = allocation
+                self.basis.add((i, j))
+                remaining_supply[i] -= allocation
+                remaining_demand[j] -= allocation
+
+        self.complete_basis()
+
+    def column_minimum_rule(self):
+        # Columns in order; each column takes from its cheapest rows that still have supply until it is served
+        remaining_supply = np.array(self.supply_values)
+        remaining_demand = np.array(self.demand_values)
+        costs = self.cost_matrix.astype(float)
+
+        for j in range(self.num_demand_nodes):
+            while remaining_demand[j] > 0 and remaining_supply.any():
+                i = int(np.argmin(np.where(remaining_supply > 0, costs[:, j], np.inf)))
+                allocation = min(remaining_supply[i], remaining_demand[j])
+                self.allocations[i, j] = allocation
+                self.basis.add((i, j))
+                remaining_supply[i] -= allocation
+                remaining_demand[j] -= allocation
+
+        self.complete_basis()
+
+    def initial_feasible_solution(self, ifs="NWCR"):
+        if ifs not in self.IFS_METHODS:
+            raise ValueError(f"Unknown IFS method: {ifs}")
+        getattr(self, self.IFS_METHODS[ifs])()
+
+    def set_initial_solution(self, allocations, basis=None):
+        # Start from allocations computed elsewhere (e.g. a batched IFS); basis is a boolean mask of basic cells
+        # and defaults to the allocated ones
+        self.allocations[:] = allocations
+        if basis is None:
+            basis = self.allocations > 0
+        self.basis = {(int(i), int(j)) for i, j in zip(*np.nonzero(basis))}
+        self.complete_basis()
+
+    def complete_basis(self):
+        # An IFS that closes a row and a column with one allocation leaves fewer than m + n - 1 basic cells;
+        # join the pieces of the basis forest with zero-valued basic cells, cheapest link first
+        num_supply_nodes = self.num_supply_nodes
+        parent = list(range(num_supply_nodes + self.num_demand_nodes))
+
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for i, j in self.basis:
+            parent[find(i)] = find(num_supply_nodes + j)
+
+        components = {}
+        for node in range(len(parent)):
+            components.setdefault(find(node), []).append(node)
+        if len(components) == 1:
+            return
+
+        costs = self.cost_matrix
+        main = components.pop(find(0))
+        main_rows = [k for k in main if k < num_supply_nodes]
+        main_columns = [k - num_supply_nodes for k in main if k >= num_supply_nodes]
+        if not main_columns:
+            # S1 is isolated, so link it to its cheapest column before anything else
+            j = int(np.argmin(costs[0]))
+            self.basis.add((0, j))
+            component = components.pop(find(num_supply_nodes + j))
+            main_rows += [k for k in component if k < num_supply_nodes]
+            main_columns = [k - num_supply_nodes for k in component if k >= num_supply_nodes]
+
+        for component in components.values():
+            rows = [k for k in component if k < num_supply_nodes]
+            columns = [k - num_supply_nodes for k in component if k >= num_supply_nodes]
+            if rows:
+                self.basis.add((rows[0], main_columns[int(np.argmin(costs[rows[0], main_columns]))]))
+            else:
+                self.basis.add((main_rows[int(np.argmin(costs[main_rows, columns[0]]))], columns[0]))
+            main_rows += rows
+            main_columns += columns
+
+    def basic_cells(self):
+        return list(self.basis)
+
+    def basis_tree(self):
+        # Adjacency lists of the basis spanning tree: basic columns of each row and basic rows of each column
+        row_adjacency = [[] for _ in range(self.num_supply_nodes)]
+        column_adjacency = [[] for _ in range(self.num_demand_nodes)]
+        for i, j in self.basic_cells():
+            row_adjacency[i].append(j)
+            column_adjacency[j].append(i)
+        return row_adjacency, column_adjacency
+
+    def rooted_basis_tree(self, root=0):
+        # The basis tree hung from a node (rows are 0..m-1, columns m..m+n-1): depth-first order, in which every
+        # subtree is a contiguous run, plus each node's parent, subtree size and depth
+        num_supply_nodes = self.num_supply_nodes
+        num_nodes = num_supply_nodes + self.num_demand_nodes
+        row_adjacency, column_adjacency = self.basis_tree()
+        parent = np.full(num_nodes, -1)
+        depth = np.zeros(num_nodes, dtype=int)
+        order = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            if node < num_supply_nodes:
+                neighbours = [num_supply_nodes + j for j in row_adjacency[node]]
+            else:
+                neighbours = column_adjacency[node - num_supply_nodes]
+            for neighbour in neighbours:
+                if neighbour != parent[node]:
+                    parent[neighbour] = node
+                    depth[neighbour] = depth[node] + 1
+                    stack.append(neighbour)
+        if len(order) != num_nodes:
+            raise ValueError("The basic cells do not span all supply and demand nodes")
+
+        order = np.array(order)
+        subtree_size = np.ones(num_nodes, dtype=int)
+        for node in order[:0:-1]:
+            subtree_size[parent[node]] += subtree_size[node]
+        return order, parent, subtree_size, depth
+
+    def tree_cell(self, node, parent_node):
+        # Basic cell of the tree edge between a node and its parent
+        if node < self.num_supply_nodes:
+            return node, parent_node - self.num_supply_nodes
+        return parent_node, node - self.num_supply_nodes
+
+    def calculate_shadow_prices(self, transportation_costs=None):
+        # Duals of the basis for the given costs, by default the problem's cost_matrix (the costs everything else
+        # prices with, including lanes changed by update_cost())
+        if transportation_costs is None:
+            transportation_costs = self.cost_matrix
+        row_adjacency, column_adjacency = self.basis_tree()
+        u_values = [None] * self.num_supply_nodes
+        v_values = [None] * self.num_demand_nodes
+
+        # Walk the basis tree from S1 so every u/v is fixed exactly once by u + v = c on its tree edge
         u_values[0] = 0
+        stack = [(0, True)]
+        while stack:
+            node, is_row = stack.pop()
+            if is_row:
+                for j in row_adjacency[node]:
+                    if v_values[j] is None:
+                        v_values[j] = transportation_costs[node][j] - u_values[node]
+                        stack.append((j, False))
+            else:
+                for i in column_adjacency[node]:
+                    if u_values[i] is None:
+                        u_values[i] = transportation_costs[i][node] - v_values[node]
+                        stack.append((i, True))
 
-        while any(u is None for u in u_values) or any(v is None for v in v_values):
-            for i in range(num_supply_nodes):
-                for j in range(num_demand_nodes):
-                    if allocations[i, j] > 0:
-                        if u_values[i] is not None and v_values[j] is None:
-                            v_values[j] = transportation_costs[i][j] - u_values[i]
-                        elif u_values[i] is None and v_values[j] is not None:
-                            u_values[i] = transportation_costs[i][j] - v_values[j]
+        if any(u is None for u in u_values) or any(v is None for v in v_values):
+            raise ValueError("The basic cells do not span all supply and demand nodes")
 
         u_values = [-u for u in u_values]
 
         return u_values, v_values
 
+    def basis_mask(self):
+        mask = np.zeros((self.num_supply_nodes, self.num_demand_nodes), dtype=bool)
+        if self.basis:
+            rows, columns = zip(*self.basis)
+            mask[list(rows), list(columns)] = True
+        return mask
+
     def calculate_opportunity_costs(self):
-        opportunity_costs = np.zeros((self.num_supply_nodes, self.num_demand_nodes), dtype=int)
-        for i in range(self.num_supply_nodes):
-            for j in range(self.num_demand_nodes):
-                if self.allocations[i, j] == 0:
-                    opportunity_costs[i, j] = self.v_values[j] - self.u_values[i]
+        u_values = np.asarray(self.u_values, dtype=self.dtype)
+        v_values = np.asarray(self.v_values, dtype=self.dtype)
+        opportunity_costs = v_values[np.newaxis, :] - u_values[:, np.newaxis]
+        opportunity_costs[self.basis_mask()] = 0
         return opportunity_costs
 
     def calculate_deltas(self):
-        deltas = np.zeros((self.num_supply_nodes, self.num_demand_nodes), dtype=int)
-        for i in range(self.num_supply_nodes):
-            for j in range(self.num_demand_nodes):
-                if self.allocations[i, j] == 0:
-                    deltas[i, j] = -(self.transportation_costs[i][j] - self.v_values[j] + self.u_values[i])
-
+        deltas = self.price_all_cells()
+        deltas[self.basis_mask()] = 0
         return deltas
 
+    def price_all_cells(self):
+        # delta = u + v - c for every cell in one broadcast (u_values are stored negated)
+        u_values = np.asarray(self.u_values, dtype=self.dtype)
+        v_values = np.asarray(self.v_values, dtype=self.dtype)
+        return v_values[np.newaxis, :] - u_values[:, np.newaxis] - self.cost_matrix
+
+    @property
+    def num_arcs(self):
+        return self.num_supply_nodes * self.num_demand_nodes
+
+    def arc_cell(self, arc):
+        return divmod(int(arc), self.num_demand_nodes)
+
+    def row_arc_range(self, first_row, last_row):
+        return first_row * self.num_demand_nodes, last_row * self.num_demand_nodes
+
+    def basic_arcs(self):
+        num_demand_nodes = self.num_demand_nodes
+        return [i * num_demand_nodes + j for i, j in self.basis]
+
+    def exchange_basis(self, leaving_arc, entering_arc):
+        self.basis.discard(self.arc_cell(leaving_arc))
+        self.basis.add(self.arc_cell(entering_arc))
+
+    def set_basic_arcs(self, arcs):
+        self.basis = {self.arc_cell(arc) for arc in arcs}
+
+    def row_lanes(self, i):
+        return np.arange(i * self.num_demand_nodes, (i + 1) * self.num_demand_nodes)
+
+    def column_lanes(self, j):
+        return np.arange(self.num_supply_nodes) * self.num_demand_nodes + j
+
+    def arc_endpoints(self, arcs):
+        return np.divmod(arcs, self.num_demand_nodes)
+
+    def flow_vector(self):
+        return self.allocations.reshape(-1)
+
+    def cost_vector(self):
+        return self.cost_matrix.reshape(-1)
+
+    def arc_deltas(self, u_values, v_values, start=0, stop=None):
+        # Deltas of the cells start..stop-1 in row-major order, broadcasting only over the rows they touch
+        num_demand_nodes = self.num_demand_nodes
+        stop = self.num_arcs if stop is None else stop
+        first_row, last_row = start // num_demand_nodes, -(-stop // num_demand_nodes)
+        block = v_values[np.newaxis, :] - u_values[first_row:last_row, np.newaxis] - self.cost_matrix[first_row:last_row]
+        offset = first_row * num_demand_nodes
+        return block.ravel()[start - offset:stop - offset]
+
+    def arc_deltas_at(self, u_values, v_values, arcs):
+        rows, columns = np.divmod(arcs, self.num_demand_nodes)
+        return v_values[columns] - u_values[rows] - self.cost_matrix[rows, columns]
+
+    def price_and_pick(self, pricing=None):
+        if pricing is not None:
+            selected = pricing.select(self, np.asarray(self.u_values, dtype=self.dtype),
+                                      np.asarray(self.v_values, dtype=self.dtype))
+            if selected is None:
+                return None, 0
+            arc, delta = selected
+            return self.arc_cell(arc), delta
+
+        # Basic cells price to exactly zero on the basis tree, so the unmasked argmax is the Dantzig pivot
+        deltas = self.price_all_cells()
+        flat_index = int(np.argmax(deltas))
+        pivot_cell = divmod(flat_index, self.num_demand_nodes)
+        return pivot_cell, deltas.flat[flat_index]
+
     def find_pivot_cell(self):
-        deltas = self.calculate_deltas()
-        pivot_cell = np.unravel_index(np.argmax(deltas, axis=None), deltas.shape)
-        return pivot_cell
+        return self.price_and_pick()[0]
 
     def total_cost(self):
-        return np.sum(self.allocations * self.transportation_costs)
+        return np.sum(self.allocations * self.cost_matrix)
 
     def identify_loop(self, pivot):
-        allocated_cells = list(zip(*np.where(self.allocations > 0)))
-        visited = set()
-
-        def loop_search(current_path, current_direction):
-            last_cell = current_path[-1]
-            visited.add(last_cell)
-            candidates = []
-
-            if current_direction == 'horizontal':
-                candidates = [(last_cell[0], j) for j in range(self.num_demand_nodes) if (last_cell[0], j) != last_cell]
-            elif current_direction == 'vertical':
-                candidates = [(i, last_cell[1]) for i in range(self.num_supply_nodes) if (i, last_cell[1]) != last_cell]
-
-            for cell in candidates:
-                if cell in allocated_cells and cell not in visited:
-                    new_path = current_path.copy()
-                    new_path.append(cell)
-
-                    if len(new_path) >= 4 and (new_path[0][0] == new_path[-1][0] or new_path[0][1] == new_path[-1][1]):
-                        # Check if the loop is formed with the correct sequence of horizontal and vertical moves
-                        valid_loop = True
-                        for idx in range(len(new_path) - 2):
-                            if (new_path[idx][0] == new_path[idx + 1][0]) == (
-                                    new_path[idx + 1][0] == new_path[idx + 2][0]):
-                                valid_loop = False
-                                break
-
-                        if valid_loop:
-                            return new_path
-
-                    alternate_direction = 'horizontal' if current_direction == 'vertical' else 'vertical'
-                    result = loop_search(new_path, alternate_direction)
-                    if result:
-                        return result
-            visited.remove(last_cell)
+        pivot_row, pivot_column = int(pivot[0]), int(pivot[1])
+        row_adjacency, column_adjacency = self.basis_tree()
+        num_supply_nodes = self.num_supply_nodes
+
+        # Rows are nodes 0..m-1 and columns m..m+n-1; the loop is the pivot plus the unique tree path
+        # between its row node and its column node
+        target = num_supply_nodes + pivot_column
+        parent = {pivot_row: None}
+        stack = [pivot_row]
+        while stack and target not in parent:
+            node = stack.pop()
+            if node < num_supply_nodes:
+                neighbours = [num_supply_nodes + j for j in row_adjacency[node]]
+            else:
+                neighbours = column_adjacency[node - num_supply_nodes]
+            for neighbour in neighbours:
+                if neighbour not in parent:
+                    parent[neighbour] = node
+                    stack.append(neighbour)
+
+        if target not in parent:
             return None
 
-        loop = loop_search([pivot], 'horizontal') or loop_search([pivot], 'vertical')
-        if loop:
-            loop = [loop[i] if i % 2 == 0 else loop[-(i % len(loop))] for i in range(len(loop))]
+        # Walk back from the column node so the cells alternate column, row, column, ... starting at the pivot
+        loop = [(pivot_row, pivot_column)]
+        node = target
+        while parent[node] is not None:
+            previous = parent[node]
+            if node < num_supply_nodes:
+                loop.append((node, previous - num_supply_nodes))
+            else:
+                loop.append((previous, node - num_supply_nodes))
+            node = previous
         return loop
 
     def update_allocations(self, loop):
         self.iteration += 1
         min_allocation = min(self.allocations[cell] for i, cell in enumerate(loop) if i % 2 == 1)
+        # On ties only the first minimising cell leaves the basis; the others stay basic at zero (in float mode
+        # allocations within flow_tolerance of the minimum count as tied)
+        leaving_cell = next(cell for i, cell in enumerate(loop)
+                            if i % 2 == 1 and self.allocations[cell] <= min_allocation + self.flow_tolerance)
 
         for i, cell in enumerate(loop):
             if i % 2 == 1:
                 self.allocations[cell] -= min_allocation
+                if self.allocations[cell] <= self.flow_tolerance:
+                    self.allocations[cell] = 0
             else:
                 self.allocations[cell] += min_allocation
 
+        self.basis.discard(leaving_cell)
+        self.basis.add(loop[0])
+        if self.history is not None:
+            loop_cells = np.array([i * self.num_demand_nodes + j for i, j in loop])
+            self.history.record(PivotRecord(loop[0], leaving_cell, loop_cells, min_allocation), self.allocations,
+                                self.basis)
+        return leaving_cell, min_allocation
+
+    def start_history(self, checkpoint_interval=50):
+        # Log every MODI pivot from the current solution on, so any earlier iteration can be rebuilt
+        self.history = IterationHistory(self.allocations, self.basis, self.iteration, self.flow_tolerance,
+                                        checkpoint_interval)
+
+    def restore_iteration(self, iteration):
+        # Go back to the solution after the given iteration (rebuilt from the history) and drop the later pivots
+        self.allocations, self.basis = self.history.state_at(iteration)
+        self.history.truncate(iteration)
+        self.iteration = iteration
+        self.u_values, self.v_values = self.calculate_shadow_prices()
+
     def has_positive_deltas(self):
-        for row in self.calculate_opportunity_costs():
-            if any(d > 0 for d in row):
-                return True
-        return False
+        return self.price_and_pick()[1] > self.cost_tolerance
+
+    def real_nodes(self):
+        supply_nodes = [i for i in range(self.num_supply_nodes) if i != self.dummy_supply_node]
+        demand_nodes = [j for j in range(self.num_demand_nodes) if j != self.dummy_demand_node]
+        return supply_nodes, demand_nodes
+
+    def is_assignment(self):
+        supply_nodes, demand_nodes = self.real_nodes()
+        return all(self.supply_values[i] == 1 for i in supply_nodes) and \
+            all(self.demand_values[j] == 1 for j in demand_nodes)
+
+    def solve_assignment(self):
+        # Every real supply and demand is 1, so solve the (rectangular) assignment problem directly; the dummy
+        # node, if any, takes the unassigned side at zero cost
+        if not self.is_assignment():
+            raise ValueError("The assignment engine needs every supply and demand value to be 1")
+        supply_nodes, demand_nodes = self.real_nodes()
+        costs = self.cost_matrix[np.ix_(supply_nodes, demand_nodes)].astype(float)
+        transposed = len(supply_nodes) > len(demand_nodes)
+        if transposed:
+            assigned, column_duals, row_duals = shortest_augmenting_path(costs.T)
+            pairs = [(i, j) for j, i in enumerate(assigned)]
+        else:
+            assigned, row_duals, column_duals = shortest_augmenting_path(costs)
+            pairs = list(enumerate(assigned))
+
+        u_true = np.zeros(self.num_supply_nodes)
+        v_true = np.zeros(self.num_demand_nodes)
+        u_true[supply_nodes] = row_duals
+        v_true[demand_nodes] = column_duals
+        for i, j in pairs:
+            self.allocations[supply_nodes[i], demand_nodes[j]] = 1
+        # The dummy's zero-cost cells cover the rest; its dual stays 0 since the unmatched side's duals are <= 0
+        if self.dummy_supply_node is not None:
+            self.allocations[self.dummy_supply_node, :] = 1 - self.allocations.sum(axis=0)
+        if self.dummy_demand_node is not None:
+            self.allocations[:, self.dummy_demand_node] = 1 - self.allocations.sum(axis=1)
+
+        # Shift to the tableau convention: u stored negated and u[0] = 0
+        self.u_values = (u_true[0] - u_true).tolist()
+        self.v_values = (v_true + u_true[0]).tolist()
+        restore_basis(self, self.u_values, self.v_values)
+
+    def solve(self, ifs="VA", pricing="dantzig", engine="auto", max_iterations=None):
+        # Solve without the GUI: IFS plus the step-by-step MODI loop or the network simplex engine, or the
+        # min-cost flow backends ("ssp", "auction") whose flow is then made basic so the usual basis and u/v come back.
+        # "auto" sends pure assignment instances to solve_assignment() and everything else to MODI.
+        start_time = time.perf_counter()
+        pricing_rule = make_pricing_rule(pricing)
+        self.reset()
+
+        if engine == "auto":
+            engine = "assignment" if self.is_assignment() else "modi"
+
+        if engine == "assignment":
+            self.solve_assignment()
+            optimal = True
+            total_cost = self.total_cost()
+        elif engine == "modi":
+            self.initial_feasible_solution(ifs)
+            optimal = self.optimize(pricing_rule, max_iterations)
+            total_cost = self.total_cost()
+        elif engine in ("network", "ssp", "auction"):
+            if engine == "ssp":
+                SuccessiveShortestPath(self).run()
+                restore_basis(self, self.u_values, self.v_values)
+            elif engine == "auction":
+                AuctionSolver(self).run()
+                restore_basis(self)
+            else:
+                self.initial_feasible_solution(ifs)
+            network = NetworkSimplex(self, pricing_rule)
+            optimal = network.run(max_iterations)
+            total_cost = network.total_cost
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+
+        return Solution(self.allocations, total_cost, self.u_values, self.v_values, self.iteration, optimal,
+                        elapsed=time.perf_counter() - start_time, pricing=pricing_rule.name,
+                        ifs=ifs if engine in ("modi", "network") else None)
+
+    def solve_approximate(self, regularization=None, tolerance=1e-4, max_iterations=1000, polish_iterations=None):
+        # Near-optimal integral plan from entropic-regularized Sinkhorn iterations, for dense instances too large
+        # for the pivoting engines; Solution.gap says how far from optimal it can be. The rounded plan is then made
+        # basic and polished by at most polish_iterations network simplex pivots (m + n by default, 0 skips it),
+        # which is usually enough to reach the optimum; optimal is only set when the pivots prove it.
+        start_time = time.perf_counter()
+        self.reset()
+        solver = SinkhornSolver(self, regularization, tolerance, max_iterations)
+        solver.run()
+        lower_bound, optimal = solver.lower_bound, False
+        if polish_iterations is None:
+            polish_iterations = self.num_supply_nodes + self.num_demand_nodes
+        if polish_iterations > 0:
+            restore_basis(self, self.u_values, self.v_values)
+            optimal = NetworkSimplex(self).run(polish_iterations)
+            if optimal:
+                lower_bound = self.total_cost()
+        return Solution(self.allocations, self.total_cost(), self.u_values, self.v_values, solver.iteration,
+                        optimal=optimal, elapsed=time.perf_counter() - start_time, lower_bound=lower_bound)
+
+    def sensitivity_analysis(self, supply_partner=None, demand_partner=None):
+        # Ranging on an optimal basis. Costs: a non-basic cell can get as cheap as c - |delta|; moving a basic
+        # cell's cost by t shifts the duals of the subtree cut off by that cell, which changes the deltas of the
+        # cells crossing the cut by +t or -t. Supply and demand values are ranged in pairs so the problem stays
+        # balanced: each supply value against demand node supply_partner (the balancing node if there is one,
+        # else D1) and each demand value against supply node demand_partner (likewise, else S1). Within the range
+        # the basis stays feasible and the total cost changes at the reported shadow price per unit.
+        self.u_values, self.v_values = self.calculate_shadow_prices()
+        num_supply_nodes = self.num_supply_nodes
+        if supply_partner is None:
+            supply_partner = self.dummy_demand_node if self.dummy_demand_node is not None else 0
+        if demand_partner is None:
+            demand_partner = self.dummy_supply_node if self.dummy_supply_node is not None else 0
+
+        costs = self.cost_matrix.astype(float)
+        basic = self.basis_mask()
+        deltas = np.where(basic, -np.inf, self.price_all_cells().astype(float))
+        cost_lower = np.where(basic, -np.inf, costs + deltas)
+        cost_upper = np.full(costs.shape, np.inf)
+
+        order, parent, subtree_size, _ = self.rooted_basis_tree()
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+        row_position, column_position = position[:num_supply_nodes], position[num_supply_nodes:]
+        for node in order[1:]:
+            i, j = self.tree_cell(node, parent[node])
+            first, last = position[node], position[node] + subtree_size[node]
+            rows_below = (row_position >= first) & (row_position < last)
+            columns_below = (column_position >= first) & (column_position < last)
+            # the side of the cut holding row i keeps its duals, the side holding column j moves by t
+            row_side_rows = rows_below if rows_below[i] else ~rows_below
+            row_side_columns = columns_below if rows_below[i] else ~columns_below
+            raised = deltas[np.ix_(row_side_rows, ~row_side_columns)]
+            lowered = deltas[np.ix_(~row_side_rows, row_side_columns)]
+            if raised.size:
+                cost_upper[i, j] = costs[i, j] - raised.max()
+            if lowered.size:
+                cost_lower[i, j] = costs[i, j] + lowered.max()
+
+        u_values, v_values = np.asarray(self.u_values), np.asarray(self.v_values)
+        supply_decrease, supply_increase = self.shipping_ranges(num_supply_nodes + supply_partner)
+        demand_decrease, demand_increase = self.shipping_ranges(demand_partner)
+        supply = np.asarray(self.supply_values, dtype=float)
+        demand = np.asarray(self.demand_values, dtype=float)
+        return SensitivityReport(
+            cost_lower, cost_upper,
+            supply - supply_decrease[:num_supply_nodes], supply + supply_increase[:num_supply_nodes],
+            v_values[supply_partner] - u_values,
+            demand - demand_decrease[num_supply_nodes:], demand + demand_increase[num_supply_nodes:],
+            v_values - u_values[demand_partner])
+
+    def shipping_ranges(self, root):
+        # How much more (and less) every node can exchange with the root node along its basis tree path before a
+        # basic flow turns negative. On the path, tree edges whose lower node is on the root's side (both rows or
+        # both columns) carry the change forwards and the others backwards.
+        order, parent, _, depth = self.rooted_basis_tree(root)
+        num_nodes = len(order)
+        same_side = (np.arange(num_nodes) < self.num_supply_nodes) == (root < self.num_supply_nodes)
+        flows = np.full(num_nodes, np.inf)
+        for node in order[1:]:
+            flows[node] = self.allocations[self.tree_cell(node, parent[node])]
+        increase = np.full(num_nodes, np.inf)
+        decrease = np.full(num_nodes, np.inf)
+        # level by level, so every parent is final before its children read it
+        by_depth = np.argsort(depth, kind="stable")
+        level_starts = np.searchsorted(depth[by_depth], np.arange(1, depth.max() + 1))
+        for nodes in np.split(by_depth, level_starts)[1:]:
+            increase[nodes] = np.minimum(increase[parent[nodes]], np.where(same_side[nodes], flows[nodes], np.inf))
+            decrease[nodes] = np.minimum(decrease[parent[nodes]], np.where(same_side[nodes], np.inf, flows[nodes]))
+        increase[root] = decrease[root] = np.inf
+        return decrease, increase
+
+    def parametric_analysis(self, direction, lambda_max=np.inf, max_iterations=None):
+        # Optimal cost of transportation_costs + lambda * direction for lambda from 0 up to lambda_max. Along one
+        # basis every delta is linear in lambda, so the next breakpoint is the first lambda at which a non-basic
+        # delta turns positive; there the basis pivots, preferring cells whose delta keeps growing, until it is
+        # optimal just past the breakpoint. direction may leave out the balancing node (its costs stay zero).
+        # Returns the ParametricSegments in order; the problem is left at the basis of the last one.
+        if len(self.basis) != self.num_supply_nodes + self.num_demand_nodes - 1:
+            raise ValueError("parametric_analysis() needs a basis from a previous solve")
+        direction = np.asarray(direction, dtype=float)
+        direction = np.pad(direction, [(0, self.num_supply_nodes - direction.shape[0]),
+                                       (0, self.num_demand_nodes - direction.shape[1])])
+        costs = self.cost_matrix.astype(float)
+        # the parametric costs are float whatever the problem's mode, so compare them with its float tolerance
+        scale = [np.abs(costs).max(), np.abs(direction).max()]
+        tolerance = comparison_tolerance(np.dtype(float), self.tolerance, scale)
+        self.iteration = 0
+        self.optimize(max_iterations=max_iterations)
+
+        segments = []
+        parameter = 0.0
+        while True:
+            deltas = self.parametric_deltas(costs)
+            direction_deltas = self.parametric_deltas(direction)
+            growing = direction_deltas > tolerance
+            if growing.any():
+                crossings = -deltas[growing] / direction_deltas[growing]
+                breakpoint = max(parameter, crossings.min())
+            else:
+                breakpoint = np.inf
+            end = min(breakpoint, lambda_max)
+            segments.append(ParametricSegment(parameter, end, np.sum(self.allocations * costs),
+                                              np.sum(self.allocations * direction), self.allocations))
+            if end == lambda_max or (max_iterations is not None and self.iteration >= max_iterations):
+                break
 
-    def generate_state(self):
-        return State(self.allocations, self.u_values, self.v_values, self.iteration)
+            parameter = breakpoint
+            while max_iterations is None or self.iteration < max_iterations:
+                deltas = self.parametric_deltas(costs) + parameter * self.parametric_deltas(direction)
+                direction_deltas = self.parametric_deltas(direction)
+                if (deltas > tolerance).any():
+                    scores = deltas
+                else:
+                    scores = np.where(np.abs(deltas) <= tolerance, direction_deltas, 0)
+                    if scores.max() <= tolerance:
+                        break
+                pivot_cell = np.unravel_index(np.argmax(scores), scores.shape)
+                self.update_allocations(self.identify_loop((int(pivot_cell[0]), int(pivot_cell[1]))))
+
+        self.u_values, self.v_values = self.calculate_shadow_prices()
+        return segments
+
+    def parametric_deltas(self, costs):
+        # Deltas of the current basis under another cost matrix, zero on basic cells
+        u_values, v_values = self.calculate_shadow_prices(costs)
+        deltas = np.asarray(v_values, dtype=float)[np.newaxis, :] - np.asarray(u_values, dtype=float)[:, np.newaxis] \
+            - costs
+        deltas[self.basis_mask()] = 0
+        return deltas
+
+    def compare_initial_solutions(self, methods=None, pricing="dantzig"):
+        # Starting cost and number of MODI pivots to optimality for each IFS method, as {method: (cost, pivots)}.
+        # The problem is left at the optimum reached from the last method.
+        results = {}
+        for ifs in methods or self.IFS_METHODS:
+            self.reset()
+            self.initial_feasible_solution(ifs)
+            starting_cost = self.total_cost()
+            self.optimize(make_pricing_rule(pricing))
+            results[ifs] = (starting_cost, self.iteration)
+        return results
+
+    def update_cost(self, i, j, cost):
+        # Change one lane cost in place; the current basis stays primal feasible, so reoptimize() can start from it.
+        # Only cost_matrix changes: transportation_costs holds the caller's rows as given and may be an integer array
+        # that cannot store the new cost.
+        if not (0 <= i < self.num_supply_nodes and 0 <= j < self.num_demand_nodes):
+            raise ValueError(f"No cell ({i}, {j}) in a {self.num_supply_nodes}x{self.num_demand_nodes} problem")
+        # same integrality check as the constructor, so int64 mode rejects a fractional cost instead of truncating it
+        numeric_mode(self.dtype, [cost])
+        self.cost_matrix[i, j] = cost
+        self.cost_tolerance = max(self.cost_tolerance, comparison_tolerance(self.dtype, self.tolerance, [cost]))
+
+    def reoptimize(self, pricing="dantzig", engine="modi", max_iterations=None):
+        # Warm start after update_cost(): keep the allocations and basis of the last solve and pivot from there.
+        # Solution.iteration counts only the pivots of this re-solve.
+        if len(self.basis) != self.num_supply_nodes + self.num_demand_nodes - 1:
+            raise ValueError("reoptimize() needs a basis from a previous solve")
+        start_time = time.perf_counter()
+        pricing_rule = make_pricing_rule(pricing)
+        self.iteration = 0
+
+        if engine == "modi":
+            optimal = self.optimize(pricing_rule, max_iterations)
+            total_cost = self.total_cost()
+        elif engine == "network":
+            network = NetworkSimplex(self, pricing_rule)
+            optimal = network.run(max_iterations)
+            total_cost = network.total_cost
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+
+        return Solution(self.allocations, total_cost, self.u_values, self.v_values, self.iteration, optimal,
+                        elapsed=time.perf_counter() - start_time, pricing=pricing_rule.name)
+
+    def add_supply_node(self, supply, costs):
+        # Append a supply node to a solved problem; its cost row covers the real demand nodes
+        supply_nodes, demand_nodes = self.real_nodes()
+        self.restructure(supply_nodes + [None], demand_nodes, self.node_values(self.supply_values, supply_nodes) +
+                         [supply], self.node_values(self.demand_values, demand_nodes), extra_row=costs)
+
+    def add_demand_node(self, demand, costs):
+        # Append a demand node to a solved problem; its cost column covers the real supply nodes
+        supply_nodes, demand_nodes = self.real_nodes()
+        self.restructure(supply_nodes, demand_nodes + [None], self.node_values(self.supply_values, supply_nodes),
+                         self.node_values(self.demand_values, demand_nodes) + [demand], extra_column=costs)
+
+    def remove_supply_node(self, i):
+        supply_nodes, demand_nodes = self.real_nodes()
+        if i not in supply_nodes:
+            raise ValueError(f"S{i + 1} is not a real supply node")
+        supply_nodes.remove(i)
+        self.restructure(supply_nodes, demand_nodes, self.node_values(self.supply_values, supply_nodes),
+                         self.node_values(self.demand_values, demand_nodes))
+
+    def remove_demand_node(self, j):
+        supply_nodes, demand_nodes = self.real_nodes()
+        if j not in demand_nodes:
+            raise ValueError(f"D{j + 1} is not a real demand node")
+        demand_nodes.remove(j)
+        self.restructure(supply_nodes, demand_nodes, self.node_values(self.supply_values, supply_nodes),
+                         self.node_values(self.demand_values, demand_nodes))
+
+    @staticmethod
+    def node_values(values, nodes):
+        return [values[node] for node in nodes]
+
+    def restructure(self, supply_nodes, demand_nodes, supply_values, demand_values, extra_row=None,
+                    extra_column=None):
+        # Rebuild the problem on the given old node indices (None marks the new node) and repair the old solution
+        # into a basis of the new one, so reoptimize() starts close to the optimum instead of from an IFS. The
+        # balancing node is recomputed; if it stays on the same side it keeps its flows and shadow price.
+        old_allocations, old_costs = self.allocations, self.cost_matrix
+        has_duals = len(self.basis) == self.num_supply_nodes + self.num_demand_nodes - 1
+        if has_duals:
+            # u_values/v_values are only refreshed by pivots, so price the current basis afresh
+            old_u, old_v = (np.asarray(prices, dtype=float) for prices in self.calculate_shadow_prices())
+        old_dummy_supply_node, old_dummy_demand_node = self.dummy_supply_node, self.dummy_demand_node
+
+        kept_columns = [j for j in demand_nodes if j is not None]
+        costs = [old_costs[i, kept_columns] if i is not None else np.array(extra_row) for i in supply_nodes]
+        if extra_column is not None:
+            costs = [np.append(row, extra_column[k]) for k, row in enumerate(costs)]
+        self.__init__(len(supply_nodes), len(demand_nodes), list(supply_values), list(demand_values), costs,
+                      self.dtype, self.tolerance)
+
+        # new index -> old index (None for nodes that did not exist before)
+        row_sources = supply_nodes + ([old_dummy_supply_node] if self.dummy_supply_node is not None else [])
+        column_sources = demand_nodes + ([old_dummy_demand_node] if self.dummy_demand_node is not None else [])
+        known_rows = [k for k, i in enumerate(row_sources) if i is not None]
+        known_columns = [k for k, j in enumerate(column_sources) if j is not None]
+        old_rows = [row_sources[k] for k in known_rows]
+        old_columns = [column_sources[k] for k in known_columns]
+        self.allocations[np.ix_(known_rows, known_columns)] = old_allocations[np.ix_(old_rows, old_columns)]
+
+        # Shadow prices in the tableau convention (u stored negated): carried over, with new nodes priced so all
+        # their cells have delta <= 0 and at least one is tight
+        u = np.full(self.num_supply_nodes, np.nan)
+        v = np.full(self.num_demand_nodes, np.nan)
+        if has_duals:
+            u[known_rows], v[known_columns] = old_u[old_rows], old_v[old_columns]
+        else:
+            u[known_rows], v[known_columns] = 0, 0
+        known = ~np.isnan(u)
+        for j in np.flatnonzero(np.isnan(v)):
+            v[j] = np.min(self.cost_matrix[known, j] + u[known])
+        for i in np.flatnonzero(np.isnan(u)):
+            u[i] = np.max(v - self.cost_matrix[i])
+
+        # Trim flow from nodes that now ship or receive too much (most expensive reduced cost first), then route
+        # what is left over cheapest reduced cost first
+        reduced_costs = self.cost_matrix - (v[np.newaxis, :] - u[:, np.newaxis])
+        column_residual = np.asarray(self.demand_values) - self.allocations.sum(axis=0)
+        for j in np.flatnonzero(column_residual < 0):
+            self.trim(self.allocations[:, j], reduced_costs[:, j], -column_residual[j])
+        row_residual = np.asarray(self.supply_values) - self.allocations.sum(axis=1)
+        for i in np.flatnonzero(row_residual < 0):
+            self.trim(self.allocations[i], reduced_costs[i], -row_residual[i])
+        row_residual = np.asarray(self.supply_values) - self.allocations.sum(axis=1)
+        column_residual = np.asarray(self.demand_values) - self.allocations.sum(axis=0)
+        route_residuals(self.allocations, reduced_costs, row_residual, column_residual)
+
+        restore_basis(self, u, v)
+
+    @staticmethod
+    def trim(flows, reduced_costs, excess):
+        # Take excess units off a row or column view, most expensive cells first
+        for k in np.argsort(-reduced_costs, kind="stable"):
+            amount = min(excess, flows[k])
+            flows[k] -= amount
+            excess -= amount
+            if excess == 0:
+                break
+
+    def optimize(self, pricing_rule=None, max_iterations=None):
+        # MODI iterations from the current basis: shadow prices, pivot, loop and update until no delta is positive
+        optimal = False
+        while True:
+            self.u_values, self.v_values = self.calculate_shadow_prices()
+            pivot_cell, delta = self.price_and_pick(pricing_rule)
+            if delta <= self.cost_tolerance:
+                optimal = True
+                break
+            if max_iterations is not None and self.iteration >= max_iterations:
+                break
+
+            loop = self.identify_loop(pivot_cell)
+            if not loop:
+                break
+            self.update_allocations(loop)
+
+        return optimal
+
+    def iter_steps(self, ifs="NWCR", pricing=None, max_iterations=None):
+        # The MODI method as a lazy stream of step events: the initial solution, then per iteration the duals, the
+        # pivot with its loop and the allocation update, ending after the duals of the optimal basis. Events carry
+        # only what changed and refer to the live problem data rather than copies. With ifs=None the stream
+        # continues from the current solution instead of computing an initial one.
+        pricing_rule = make_pricing_rule(pricing) if pricing is not None else None
+        if ifs is not None:
+            self.initial_feasible_solution(ifs)
+            yield InitialSolutionEvent(ifs, self.allocations, self.basis, self.total_cost())
+
+        while True:
+            self.u_values, self.v_values = self.calculate_shadow_prices()
+            yield DualsComputedEvent(self.u_values, self.v_values)
+            pivot_cell, delta = self.price_and_pick(pricing_rule)
+            if delta <= self.cost_tolerance or (max_iterations is not None and self.iteration >= max_iterations):
+                return
+            loop = self.identify_loop(pivot_cell)
+            if not loop:
+                return
+            yield PivotChosenEvent(pivot_cell, delta, loop)
+            leaving_cell, theta = self.update_allocations(loop)
+            yield AllocationsUpdatedEvent(self.iteration, loop, leaving_cell, theta)
 
     def reset(self):
-        # Reset all instance variables to their initial state
+        # Reset all instance variables to their initial state (the data is already balanced, so keep the dummy)
+        dummy_supply_node, dummy_demand_node = self.dummy_supply_node, self.dummy_demand_node
+        cost_matrix, cost_tolerance = self.cost_matrix, self.cost_tolerance
         self.__init__(self.num_supply_nodes, self.num_demand_nodes, self.supply_values, self.demand_values,
-                      self.transportation_costs)
+                      self.transportation_costs, self.dtype, self.tolerance)
+        self.dummy_supply_node, self.dummy_demand_node = dummy_supply_node, dummy_demand_node
+        # lane costs changed by update_cost() live only in cost_matrix
+        self.cost_matrix, self.cost_tolerance = cost_matrix, cost_tolerance
+
+
+class SparseTransportationProblem:
+    # Transportation problem over an explicit list of allowed lanes (arcs); missing lanes are forbidden routes.
+    # Arcs are sorted by (row, column) so the lanes of supply node i are the CSR slice arc_start[i]:arc_start[i + 1].
+    # Artificial big-M arcs are appended after the real ones only when the allowed lanes cannot carry a feasible
+    # starting solution or do not connect every node; they never carry flow in a feasible optimum.
+    IFS_METHODS = {
+        "NWCR": "northwest_corner_rule",
+        "MCR": "minimum_cost_rule",
+    }
+
+    def __init__(self, num_supply_nodes, num_demand_nodes, supply_values, demand_values, arc_rows, arc_columns,
+                 arc_costs, dtype=None, tolerance=None):
+        self.num_supply_nodes = num_supply_nodes
+        self.num_demand_nodes = num_demand_nodes
+        self.supply_values = list(supply_values)
+        self.demand_values = list(demand_values)
+        self.arc_rows = np.asarray(arc_rows, dtype=np.int64)
+        self.arc_columns = np.asarray(arc_columns, dtype=np.int64)
+        self.dtype = numeric_mode(dtype, supply_values, demand_values, arc_costs)
+        self.tolerance = tolerance
+        self.arc_costs = np.asarray(arc_costs, dtype=self.dtype)
+
+        if not (self.arc_rows.shape == self.arc_columns.shape == self.arc_costs.shape):
+            raise ValueError("Arc rows, columns and costs must have the same length")
+        if self.arc_rows.size and (self.arc_rows.min() < 0 or self.arc_rows.max() >= num_supply_nodes or
+                                   self.arc_columns.min() < 0 or self.arc_columns.max() >= num_demand_nodes):
+            raise ValueError("Arc endpoints must be valid supply and demand nodes")
+
+        self.balance_problem()
+
+        order = np.lexsort((self.arc_columns, self.arc_rows))
+        self.arc_rows = self.arc_rows[order]
+        self.arc_columns = self.arc_columns[order]
+        self.arc_costs = self.arc_costs[order]
+        if np.any((self.arc_rows[1:] == self.arc_rows[:-1]) & (self.arc_columns[1:] == self.arc_columns[:-1])):
+            raise ValueError("Each lane may only be listed once")
+        self.arc_start = np.searchsorted(self.arc_rows, np.arange(self.num_supply_nodes + 1))
+        self.num_real_arcs = self.arc_costs.size
+        scale = np.abs(self.arc_costs).max() if self.arc_costs.size else 0
+        self.big_m = (scale + 1) * (self.num_supply_nodes + self.num_demand_nodes)
+        self.column_order = None
+        self.cost_tolerance = comparison_tolerance(self.dtype, tolerance, self.arc_costs)
+        self.flow_tolerance = comparison_tolerance(self.dtype, tolerance, self.supply_values + self.demand_values)
+
+        self.reset()
+
+    @classmethod
+    def from_csr(cls, supply_values, demand_values, arc_start, arc_columns, arc_costs):
+        arc_rows = np.repeat(np.arange(len(supply_values)), np.diff(arc_start))
+        return cls(len(supply_values), len(demand_values), supply_values, demand_values, arc_rows, arc_columns,
+                   arc_costs)
+
+    @classmethod
+    def from_dense(cls, supply_values, demand_values, transportation_costs):
+        # Non-finite costs (e.g. float("inf") for a prohibited route) become missing lanes
+        costs = np.asarray(transportation_costs, dtype=float)
+        arc_rows, arc_columns = np.nonzero(np.isfinite(costs))
+        arc_costs = costs[arc_rows, arc_columns]
+        if np.all(arc_costs == np.round(arc_costs)):
+            arc_costs = arc_costs.astype(int)
+        return cls(len(supply_values), len(demand_values), supply_values, demand_values, arc_rows, arc_columns,
+                   arc_costs)
+
+    def balance_problem(self):
+        total_supply = sum(self.supply_values)
+        total_demand = sum(self.demand_values)
+
+        # The dummy node gets a zero-cost lane to every node on the other side
+        if total_supply > total_demand:
+            self.demand_values.append(total_supply - total_demand)
+            dummy_rows = np.arange(self.num_supply_nodes)
+            dummy_columns = np.full(self.num_supply_nodes, self.num_demand_nodes)
+            self.num_demand_nodes += 1
+        elif total_demand > total_supply:
+            self.supply_values.append(total_demand - total_supply)
+            dummy_rows = np.full(self.num_demand_nodes, self.num_supply_nodes)
+            dummy_columns = np.arange(self.num_demand_nodes)
+            self.num_supply_nodes += 1
+        else:
+            return
+        self.arc_rows = np.concatenate([self.arc_rows, dummy_rows])
+        self.arc_columns = np.concatenate([self.arc_columns, dummy_columns])
+        self.arc_costs = np.concatenate([self.arc_costs, np.zeros(dummy_rows.size, dtype=self.arc_costs.dtype)])
+
+    def reset(self):
+        self.arc_rows = self.arc_rows[:self.num_real_arcs]
+        self.arc_columns = self.arc_columns[:self.num_real_arcs]
+        self.arc_costs = self.arc_costs[:self.num_real_arcs]
+        self.flows = np.zeros(self.num_real_arcs, dtype=self.dtype)
+        self.basis = set()
+        self.u_values = [0] * self.num_supply_nodes
+        self.v_values = [0] * self.num_demand_nodes
+        self.iteration = 0
+
+    def add_artificial_arcs(self, rows, columns, flows):
+        first_arc = self.arc_costs.size
+        self.arc_rows = np.concatenate([self.arc_rows, np.asarray(rows, dtype=np.int64)])
+        self.arc_columns = np.concatenate([self.arc_columns, np.asarray(columns, dtype=np.int64)])
+        self.arc_costs = np.concatenate([self.arc_costs, np.full(len(rows), self.big_m, dtype=self.arc_costs.dtype)])
+        self.flows = np.concatenate([self.flows, np.asarray(flows, dtype=self.flows.dtype)])
+        return range(first_arc, self.arc_costs.size)
+
+    def initial_feasible_solution(self, ifs="MCR"):
+        if ifs not in self.IFS_METHODS:
+            raise ValueError(f"Unknown IFS method for sparse problems: {ifs}")
+        getattr(self, self.IFS_METHODS[ifs])()
+
+    def allocate_in_order(self, arcs):
+        # Greedy fill over the given arc order, skipping exhausted rows and columns
+        remaining_supply = list(self.supply_values)
+        remaining_demand = list(self.demand_values)
+        remaining_total = sum(remaining_supply)
+        arc_rows, arc_columns = self.arc_rows.tolist(), self.arc_columns.tolist()
+        for arc in arcs:
+            if remaining_total == 0:
+                break
+            i, j = arc_rows[arc], arc_columns[arc]
+            if remaining_supply[i] == 0 or remaining_demand[j] == 0:
+                continue
+            allocation = min(remaining_supply[i], remaining_demand[j])
+            self.flows[arc] = allocation
+            self.basis.add(arc)
+            remaining_supply[i] -= allocation
+            remaining_demand[j] -= allocation
+            remaining_total -= allocation
+
+        # Whatever the allowed lanes could not place goes over artificial arcs, north-west corner style
+        rows, columns, flows = [], [], []
+        i = j = 0
+        while remaining_total > 0:
+            while remaining_supply[i] == 0:
+                i += 1
+            while remaining_demand[j] == 0:
+                j += 1
+            allocation = min(remaining_supply[i], remaining_demand[j])
+            rows.append(i)
+            columns.append(j)
+            flows.append(allocation)
+            remaining_supply[i] -= allocation
+            remaining_demand[j] -= allocation
+            remaining_total -= allocation
+        if rows:
+            self.basis.update(self.add_artificial_arcs(rows, columns, flows))
+
+        self.complete_basis()
+
+    def northwest_corner_rule(self):
+        # Without a full grid there is no staircase; lanes are filled row by row in column order
+        self.allocate_in_order(range(self.num_real_arcs))
+
+    def minimum_cost_rule(self):
+        self.allocate_in_order(np.argsort(self.arc_costs[:self.num_real_arcs], kind="stable").tolist())
+
+    def complete_basis(self):
+        # Join the basis forest into a spanning tree with zero-flow arcs: cheapest real lanes first, then artificial
+        num_supply_nodes = self.num_supply_nodes
+        parent = list(range(num_supply_nodes + self.num_demand_nodes))
+
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        num_components = len(parent)
+        for arc in self.basis:
+            root_i, root_j = find(int(self.arc_rows[arc])), find(num_supply_nodes + int(self.arc_columns[arc]))
+            if root_i != root_j:
+                parent[root_i] = root_j
+                num_components -= 1
+        if num_components == 1:
+            return
+
+        arc_rows, arc_columns = self.arc_rows.tolist(), self.arc_columns.tolist()
+        for arc in np.argsort(self.arc_costs[:self.num_real_arcs], kind="stable").tolist():
+            root_i, root_j = find(arc_rows[arc]), find(num_supply_nodes + arc_columns[arc])
+            if root_i != root_j:
+                parent[root_i] = root_j
+                self.basis.add(arc)
+                num_components -= 1
+                if num_components == 1:
+                    return
+
+        components = {}
+        for node in range(len(parent)):
+            components.setdefault(find(node), []).append(node)
+        main = components.pop(find(0))
+        main_rows = [k for k in main if k < num_supply_nodes]
+        main_columns = [k - num_supply_nodes for k in main if k >= num_supply_nodes]
+        rows, columns = [], []
+        for component in components.values():
+            component_rows = [k for k in component if k < num_supply_nodes]
+            component_columns = [k - num_supply_nodes for k in component if k >= num_supply_nodes]
+            if not main_columns:
+                rows.append(main_rows[0])
+                columns.append(component_columns[0])
+            elif component_rows:
+                rows.append(component_rows[0])
+                columns.append(main_columns[0])
+            else:
+                rows.append(main_rows[0])
+                columns.append(component_columns[0])
+            main_rows += component_rows
+            main_columns += component_columns
+        self.basis.update(self.add_artificial_arcs(rows, columns, [0] * len(rows)))
+
+    @property
+    def num_arcs(self):
+        return self.arc_costs.size
+
+    def arc_cell(self, arc):
+        return int(self.arc_rows[arc]), int(self.arc_columns[arc])
+
+    def row_arc_range(self, first_row, last_row):
+        return int(self.arc_start[first_row]), int(self.arc_start[last_row])
+
+    def basic_arcs(self):
+        return list(self.basis)
+
+    def exchange_basis(self, leaving_arc, entering_arc):
+        self.basis.discard(leaving_arc)
+        self.basis.add(entering_arc)
+
+    def set_basic_arcs(self, arcs):
+        self.basis = set(arcs)
+
+    def row_lanes(self, i):
+        return np.arange(self.arc_start[i], self.arc_start[i + 1])
+
+    def column_lanes(self, j):
+        if self.column_order is None:
+            self.column_order = np.argsort(self.arc_columns[:self.num_real_arcs], kind="stable")
+            self.column_start = np.searchsorted(self.arc_columns[self.column_order], np.arange(self.num_demand_nodes + 1))
+        return self.column_order[self.column_start[j]:self.column_start[j + 1]]
+
+    def arc_endpoints(self, arcs):
+        return self.arc_rows[arcs], self.arc_columns[arcs]
+
+    def flow_vector(self):
+        return self.flows
+
+    def cost_vector(self):
+        return self.arc_costs
+
+    def arc_deltas(self, u_values, v_values, start=0, stop=None):
+        stop = self.num_arcs if stop is None else stop
+        return v_values[self.arc_columns[start:stop]] - u_values[self.arc_rows[start:stop]] - self.arc_costs[start:stop]
+
+    def arc_deltas_at(self, u_values, v_values, arcs):
+        return v_values[self.arc_columns[arcs]] - u_values[self.arc_rows[arcs]] - self.arc_costs[arcs]
+
+    def total_cost(self):
+        return self.flows @ self.arc_costs
+
+    def solve(self, ifs="MCR", pricing="dantzig", engine="network", max_iterations=None):
+        # IFS and pricing work on the lane arrays and the loop search on the basis tree, so nothing is m x n
+        start_time = time.perf_counter()
+        pricing_rule = make_pricing_rule(pricing)
+        self.reset()
+        if engine == "ssp":
+            SuccessiveShortestPath(self).run()
+            restore_basis(self, self.u_values, self.v_values)
+        elif engine == "network":
+            self.initial_feasible_solution(ifs)
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+        network = NetworkSimplex(self, pricing_rule)
+        optimal = network.run(max_iterations)
+
+        if optimal and np.any(self.flows[self.num_real_arcs:] > 0):
+            raise ValueError("The allowed lanes cannot carry a feasible allocation")
+
+        # Solution.allocations holds the flow on each real lane, aligned with arc_rows/arc_columns
+        return Solution(self.flows[:self.num_real_arcs], network.total_cost, self.u_values, self.v_values,
+                        self.iteration, optimal, elapsed=time.perf_counter() - start_time, pricing=pricing_rule.name)
+
+
+# Step events yielded by TransportationProblem.iter_steps(), in this order: one InitialSolutionEvent, then per
+# iteration DualsComputedEvent, PivotChosenEvent and AllocationsUpdatedEvent, and a last DualsComputedEvent for
+# the optimal basis.
+
+class InitialSolutionEvent:
+    __slots__ = ("ifs", "allocations", "basis", "total_cost")
+
+    def __init__(self, ifs, allocations, basis, total_cost):
+        self.ifs = ifs
+        self.allocations = allocations
+        self.basis = basis
+        self.total_cost = total_cost
+
+
+class DualsComputedEvent:
+    __slots__ = ("u_values", "v_values")
+
+    def __init__(self, u_values, v_values):
+        self.u_values = u_values
+        self.v_values = v_values
+
+
+class PivotChosenEvent:
+    # loop starts at the pivot cell, signs alternating +, -, +, ... (see identify_loop)
+    __slots__ = ("cell", "delta", "loop")
 
+    def __init__(self, cell, delta, loop):
+        self.cell = cell
+        self.delta = delta
+        self.loop = loop
 
-class State:
-    def __init__(self, allocations, u_values, v_values, iteration):
+
+class AllocationsUpdatedEvent:
+    # theta moved around the loop of the preceding PivotChosenEvent; leaving is the cell that left the basis
+    __slots__ = ("iteration", "loop", "leaving", "theta")
+
+    def __init__(self, iteration, loop, leaving, theta):
+        self.iteration = iteration
+        self.loop = loop
+        self.leaving = leaving
+        self.theta = theta
+
+
+class PivotRecord:
+    # One MODI pivot: the entering and leaving cells, the loop as flat cell indices (entering cell first, signs
+    # alternating +, -, +, ...) and the quantity theta moved around it
+    __slots__ = ("entering", "leaving", "loop", "theta")
+
+    def __init__(self, entering, leaving, loop, theta):
+        self.entering = entering
+        self.leaving = leaving
+        self.loop = loop
+        self.theta = theta
+
+
+class IterationHistory:
+    # Iteration history as the starting solution plus one PivotRecord per pivot, instead of a full allocation
+    # matrix per step. Every checkpoint_interval pivots the solution is kept as its basic cells and their
+    # allocations (m + n - 1 entries; every other cell is zero), so rebuilding any iteration replays at most
+    # checkpoint_interval pivots.
+    def __init__(self, allocations, basis, first_iteration=0, flow_tolerance=0, checkpoint_interval=50):
+        self.first_iteration = first_iteration
+        self.flow_tolerance = flow_tolerance
+        self.checkpoint_interval = checkpoint_interval
+        self.shape, self.dtype = allocations.shape, allocations.dtype
+        self.records = []
+        self.checkpoints = {0: self.checkpoint(allocations, basis)}
+
+    def __len__(self):
+        return len(self.records)
+
+    @staticmethod
+    def checkpoint(allocations, basis):
+        cells = np.array(sorted(basis), dtype=int).reshape(-1, 2)
+        rows, columns = cells[:, 0], cells[:, 1]
+        return rows, columns, allocations[rows, columns]
+
+    def record(self, pivot, allocations, basis):
+        self.records.append(pivot)
+        if len(self.records) % self.checkpoint_interval == 0:
+            self.checkpoints[len(self.records)] = self.checkpoint(allocations, basis)
+
+    def state_at(self, iteration):
+        # Allocations and basis after the given iteration, from the nearest checkpoint at or before it
+        pivots = iteration - self.first_iteration
+        if not 0 <= pivots <= len(self.records):
+            raise ValueError(f"Iteration {iteration} is not in the history")
+        start = pivots - pivots % self.checkpoint_interval
+        rows, columns, values = self.checkpoints[start]
+        allocations = np.zeros(self.shape, dtype=self.dtype)
+        allocations[rows, columns] = values
+        basis = set(zip(rows.tolist(), columns.tolist()))
+        flat_allocations = allocations.reshape(-1)
+        for pivot in self.records[start:pivots]:
+            # same arithmetic as update_allocations, including the snap to zero in float mode
+            plus_cells, minus_cells = pivot.loop[0::2], pivot.loop[1::2]
+            flat_allocations[plus_cells] += pivot.theta
+            flat_allocations[minus_cells] -= pivot.theta
+            emptied = minus_cells[flat_allocations[minus_cells] <= self.flow_tolerance]
+            flat_allocations[emptied] = 0
+            basis.discard(pivot.leaving)
+            basis.add(pivot.entering)
+        return allocations, basis
+
+    def truncate(self, iteration):
+        pivots = iteration - self.first_iteration
+        del self.records[pivots:]
+        for checkpoint in [k for k in self.checkpoints if k > pivots]:
+            del self.checkpoints[checkpoint]
+
+
+class Solution:
+    def __init__(self, allocations, total_cost, u_values, v_values, iteration, optimal=True, elapsed=None,
+                 pricing=None, lower_bound=None, ifs=None):
         self.allocations = allocations.copy()
-        self.u_values = u_values.copy()
-        self.v_values = v_values.copy()
+        self.total_cost = total_cost
+        self.u_values = list(u_values)
+        self.v_values = list(v_values)
         self.iteration = iteration
+        self.optimal = optimal
+        self.elapsed = elapsed
+        self.pricing = pricing
+        # IFS method the solve started from (None for engines that do not use one)
+        self.ifs = ifs
+        # Approximate solutions carry a dual lower bound on the optimal cost instead of an optimality proof
+        self.lower_bound = lower_bound
+        self.gap = None if lower_bound is None else total_cost - lower_bound
+
+
+class ParametricSegment:
+    # One basis of TransportationProblem.parametric_analysis(): on [start, end] the allocations stay optimal and
+    # the total cost is cost + lambda * slope
+    def __init__(self, start, end, cost, slope, allocations):
+        self.start = start
+        self.end = end
+        self.cost = cost
+        self.slope = slope
+        self.allocations = allocations.copy()
+
+    def cost_at(self, parameter):
+        return self.cost + parameter * self.slope
+
+
+class SensitivityReport:
+    # Ranges from TransportationProblem.sensitivity_analysis(): per cell, the cost interval that keeps the basis
+    # optimal; per supply/demand node, the value interval that keeps it feasible and the shadow price (cost change
+    # per unit) against the partner node
+    def __init__(self, cost_lower, cost_upper, supply_lower, supply_upper, supply_prices, demand_lower,
+                 demand_upper, demand_prices):
+        self.cost_lower = cost_lower
+        self.cost_upper = cost_upper
+        self.supply_lower = supply_lower
+        self.supply_upper = supply_upper
+        self.supply_prices = supply_prices
+        self.demand_lower = demand_lower
+        self.demand_upper = demand_upper
+        self.demand_prices = demand_prices
+
+
+# Pricing rules choose the entering cell. select() gets the problem and the u/v vectors (u stored negated, as in
+# calculate_shadow_prices) and returns (arc, delta) for an improving cell, or None when no delta is positive.
+# Arcs are cell indices in row-major order, see TransportationProblem.arc_cell.
+
+def row_blocks(num_rows, rows_per_block, start_row):
+    # Fixed row blocks, visited cyclically starting with the block that holds start_row
+    num_blocks = -(-num_rows // rows_per_block)
+    first_block = start_row // rows_per_block
+    for k in range(num_blocks):
+        first_row = ((first_block + k) % num_blocks) * rows_per_block
+        yield first_row, min(first_row + rows_per_block, num_rows)
+
+
+class DantzigPricing:
+    name = "dantzig"
+
+    def select(self, problem, u_values, v_values):
+        deltas = problem.arc_deltas(u_values, v_values)
+        arc = int(np.argmax(deltas))
+        if deltas[arc] <= problem.cost_tolerance:
+            return None
+        return arc, deltas[arc]
+
+
+class FirstImprovingPricing:
+    name = "first"
+
+    def __init__(self, rows_per_block=None):
+        self.rows_per_block = rows_per_block
+        self.next_row = 0
+
+    def select(self, problem, u_values, v_values):
+        # Scan row blocks from where the last search stopped and take the first improving cell found
+        num_rows = problem.num_supply_nodes
+        rows_per_block = self.rows_per_block or max(1, math.isqrt(num_rows))
+        for first_row, last_row in row_blocks(num_rows, rows_per_block, self.next_row):
+            start, stop = problem.row_arc_range(first_row, last_row)
+            improving = np.flatnonzero(problem.arc_deltas(u_values, v_values, start, stop) > problem.cost_tolerance)
+            if improving.size:
+                arc = start + int(improving[0])
+                self.next_row = problem.arc_cell(arc)[0]
+                return arc, problem.arc_deltas_at(u_values, v_values, np.array([arc]))[0]
+        return None
+
+
+class BlockPricing:
+    name = "block"
+
+    def __init__(self, rows_per_block=None):
+        self.rows_per_block = rows_per_block
+        self.next_row = 0
+
+    def select(self, problem, u_values, v_values):
+        # Partial pricing: the best cell of the first row block that has any improving cell
+        num_rows = problem.num_supply_nodes
+        rows_per_block = self.rows_per_block or max(1, math.isqrt(num_rows))
+        for first_row, last_row in row_blocks(num_rows, rows_per_block, self.next_row):
+            start, stop = problem.row_arc_range(first_row, last_row)
+            if start == stop:
+                continue
+            deltas = problem.arc_deltas(u_values, v_values, start, stop)
+            best = int(np.argmax(deltas))
+            if deltas[best] > problem.cost_tolerance:
+                self.next_row = last_row % num_rows
+                return start + best, deltas[best]
+        return None
+
+
+class CandidateListPricing:
+    name = "candidate"
+
+    def __init__(self, list_size=64, minor_iterations=None):
+        self.list_size = list_size
+        self.minor_iterations = minor_iterations if minor_iterations is not None else list_size // 2
+        self.candidates = np.empty(0, dtype=np.int64)
+        self.minor_count = 0
+
+    def select(self, problem, u_values, v_values):
+        # Minor iterations reprice only the short candidate list; a major iteration prices every cell to refill it
+        if self.candidates.size and self.minor_count < self.minor_iterations:
+            deltas = problem.arc_deltas_at(u_values, v_values, self.candidates)
+            keep = deltas > problem.cost_tolerance
+            self.candidates, deltas = self.candidates[keep], deltas[keep]
+            if self.candidates.size:
+                self.minor_count += 1
+                best = int(np.argmax(deltas))
+                return int(self.candidates[best]), deltas[best]
+
+        deltas = problem.arc_deltas(u_values, v_values)
+        improving = np.flatnonzero(deltas > problem.cost_tolerance)
+        if not improving.size:
+            self.candidates = improving
+            return None
+        if improving.size > self.list_size:
+            improving = improving[np.argpartition(deltas[improving], -self.list_size)[-self.list_size:]]
+        self.candidates = improving
+        self.minor_count = 0
+        best = int(improving[np.argmax(deltas[improving])])
+        return best, deltas[best]
+
+
+class NetworkSimplex:
+    # The transportation problem as a bipartite network: rows are nodes 0..m-1 and columns m..m+n-1, the basis is a
+    # spanning tree rooted at S1 stored as parent/depth/thread arrays (thread is the preorder successor, cyclic).
+    # A pivot only re-hangs the subtree cut off by the leaving arc, so only that subtree's potentials change.
+    # Works on any problem exposing the arc interface (arc_cell, basic_arcs, flow_vector, cost_vector, ...).
+    def __init__(self, problem, pricing="dantzig"):
+        self.problem = problem
+        self.pricing = make_pricing_rule(pricing)
+        self.num_supply_nodes = problem.num_supply_nodes
+        self.flows = problem.flow_vector()
+        self.costs = problem.cost_vector()
+        self.total_cost = problem.total_cost()
+        self.build_tree()
+
+    def build_tree(self):
+        problem = self.problem
+        num_supply_nodes = self.num_supply_nodes
+        num_nodes = num_supply_nodes + problem.num_demand_nodes
+        adjacency = [[] for _ in range(num_nodes)]
+        for arc in problem.basic_arcs():
+            i, j = problem.arc_cell(arc)
+            adjacency[i].append((num_supply_nodes + j, arc))
+            adjacency[num_supply_nodes + j].append((i, arc))
+
+        self.parent = [-1] * num_nodes
+        self.parent_arc = [-1] * num_nodes
+        self.depth = [0] * num_nodes
+        self.u_values = np.zeros(num_supply_nodes, dtype=self.costs.dtype)
+        self.v_values = np.zeros(problem.num_demand_nodes, dtype=self.costs.dtype)
+
+        order = []
+        visited = [False] * num_nodes
+        visited[0] = True
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for neighbour, arc in adjacency[node]:
+                if visited[neighbour]:
+                    continue
+                visited[neighbour] = True
+                self.parent[neighbour] = node
+                self.parent_arc[neighbour] = arc
+                self.depth[neighbour] = self.depth[node] + 1
+                # same convention as calculate_shadow_prices: v - u = c on basic cells
+                i, j = problem.arc_cell(arc)
+                if neighbour >= num_supply_nodes:
+                    self.v_values[j] = self.costs[arc] + self.u_values[i]
+                else:
+                    self.u_values[i] = self.v_values[j] - self.costs[arc]
+                stack.append(neighbour)
+
+        if len(order) != num_nodes:
+            raise ValueError("The basic cells do not span all supply and demand nodes")
+
+        self.thread = [0] * num_nodes
+        self.reverse_thread = [0] * num_nodes
+        for node, successor in zip(order, order[1:] + order[:1]):
+            self.thread[node] = successor
+            self.reverse_thread[successor] = node
+
+    def pivot(self, entering_arc, delta):
+        problem = self.problem
+        flows = self.flows
+        parent, parent_arc, depth = self.parent, self.parent_arc, self.depth
+        i, j = problem.arc_cell(entering_arc)
+        row_node, column_node = i, self.num_supply_nodes + j
+
+        # Climb from both ends of the entering arc to their common ancestor; each node stands for its parent arc
+        row_path, column_path = [], []
+        x, y = row_node, column_node
+        while x != y:
+            if depth[x] >= depth[y]:
+                row_path.append(x)
+                x = parent[x]
+            else:
+                column_path.append(y)
+                y = parent[y]
+
+        # Arcs at even distance from either end lose flow; ties leave in loop order, as in update_allocations
+        minus_nodes = column_path[0::2] + row_path[0::2][::-1]
+        theta = min(flows[parent_arc[node]] for node in minus_nodes)
+        leaving = next(node for node in minus_nodes if flows[parent_arc[node]] <= theta + problem.flow_tolerance)
+        for node in column_path[0::2] + row_path[0::2]:
+            flows[parent_arc[node]] -= theta
+            if flows[parent_arc[node]] <= problem.flow_tolerance:
+                flows[parent_arc[node]] = 0
+        for node in column_path[1::2] + row_path[1::2]:
+            flows[parent_arc[node]] += theta
+        flows[entering_arc] += theta
+        self.total_cost -= theta * delta
+
+        problem.exchange_basis(parent_arc[leaving], entering_arc)
+        problem.iteration += 1
+
+        # The subtree under the leaving arc is re-hung from the entering arc
+        if leaving in row_path:
+            inner, outer, shift = row_node, column_node, delta
+        else:
+            inner, outer, shift = column_node, row_node, -delta
+
+        subtree = [leaving]
+        node = self.thread[leaving]
+        while depth[node] > depth[leaving]:
+            subtree.append(node)
+            node = self.thread[node]
+        before = self.reverse_thread[leaving]
+        self.thread[before] = node
+        self.reverse_thread[node] = before
+
+        node, new_parent, new_arc = inner, outer, entering_arc
+        while True:
+            old_parent, old_arc = parent[node], parent_arc[node]
+            parent[node], parent_arc[node] = new_parent, new_arc
+            if node == leaving:
+                break
+            node, new_parent, new_arc = old_parent, node, old_arc
+
+        children = {node: [] for node in subtree}
+        for node in subtree:
+            if node != inner:
+                children[parent[node]].append(node)
+        order = []
+        depth[inner] = depth[outer] + 1
+        stack = [inner]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for child in children[node]:
+                depth[child] = depth[node] + 1
+                stack.append(child)
+
+        after = self.thread[outer]
+        for node, successor in zip([outer] + order, order + [after]):
+            self.thread[node] = successor
+            self.reverse_thread[successor] = node
+
+        num_supply_nodes = self.num_supply_nodes
+        self.u_values[[node for node in subtree if node < num_supply_nodes]] += shift
+        self.v_values[[node - num_supply_nodes for node in subtree if node >= num_supply_nodes]] += shift
+
+    def run(self, max_iterations=None):
+        problem = self.problem
+        optimal = False
+        while True:
+            selected = self.pricing.select(problem, self.u_values, self.v_values)
+            if selected is None:
+                optimal = True
+                break
+            if max_iterations is not None and problem.iteration >= max_iterations:
+                break
+            arc, delta = selected
+            self.pivot(arc, delta)
+
+        problem.u_values = self.u_values.tolist()
+        problem.v_values = self.v_values.tolist()
+        return optimal
+
+
+class SuccessiveShortestPath:
+    # Min-cost flow view of the problem: supply is sent from rows to columns along shortest paths of the residual
+    # network. Row/column potentials keep reduced costs c + p_row - p_column non-negative so each search is a
+    # Dijkstra over the arc interface (row_lanes/column_lanes), and at the end they are optimal duals. The potentials
+    # start as the column minima with rows priced to match, so each row first ships along its tight arcs and the
+    # searches only move what is left. Excesses, deficits and residual flows within the problem's flow_tolerance
+    # count as zero.
+    def __init__(self, problem):
+        self.problem = problem
+        self.tolerance = problem.flow_tolerance
+        self.flows = problem.flow_vector()
+        self.costs = problem.cost_vector()
+        self.row_potentials = np.zeros(problem.num_supply_nodes)
+        self.column_potentials = np.zeros(problem.num_demand_nodes)
+        for j in range(problem.num_demand_nodes):
+            arcs = problem.column_lanes(j)
+            if arcs.size:
+                self.column_potentials[j] = self.costs[arcs].min()
+        for i in range(problem.num_supply_nodes):
+            arcs = problem.row_lanes(i)
+            if arcs.size:
+                columns = problem.arc_endpoints(arcs)[1]
+                self.row_potentials[i] = (self.column_potentials[columns] - self.costs[arcs]).max()
+        self.augmentations = 0
+
+    def ship_tight_arcs(self, excess, deficit):
+        # Send what each row can along its zero reduced cost arcs before the first search: flow on tight arcs keeps
+        # the potentials optimal, and it leaves far fewer units for the shortest path searches
+        problem = self.problem
+        for i in np.flatnonzero(excess > self.tolerance).tolist():
+            arcs = problem.row_lanes(i)
+            columns = problem.arc_endpoints(arcs)[1]
+            reduced = self.costs[arcs] + self.row_potentials[i] - self.column_potentials[columns]
+            tight = (reduced <= 0) & (deficit[columns] > self.tolerance)
+            arcs, columns = arcs[tight], columns[tight]
+            capacity = deficit[columns]
+            shipped = np.clip(excess[i] - (np.cumsum(capacity) - capacity), 0, capacity)
+            self.flows[arcs] += shipped.astype(self.flows.dtype)
+            deficit[columns] -= shipped
+            excess[i] -= shipped.sum()
+
+    def shortest_paths(self, excess, deficit):
+        # Dijkstra from every row with excess until the nearest columns with deficit are settled (all of them when
+        # several are tied). Nodes sit in a binary heap as (distance, node) with rows numbered 0..m-1 and columns
+        # m..m+n-1; an improved node is pushed again and the stale entry is skipped when popped (lazy deletion).
+        # Arc relaxations are vectorized per scanned node. Returns the sinks in settling order, or None if no
+        # column with deficit can be reached.
+        problem = self.problem
+        num_supply_nodes = problem.num_supply_nodes
+        costs, flows = self.costs, self.flows
+        row_potentials, column_potentials = self.row_potentials, self.column_potentials
+        row_distance = np.where(excess > self.tolerance, 0.0, np.inf)
+        column_distance = np.full(problem.num_demand_nodes, np.inf)
+        row_done = np.zeros(num_supply_nodes, dtype=bool)
+        column_done = np.zeros(problem.num_demand_nodes, dtype=bool)
+        row_predecessor = np.full(num_supply_nodes, -1)
+        column_predecessor = np.full(problem.num_demand_nodes, -1)
+        heap = [(0.0, i) for i in np.flatnonzero(excess > self.tolerance).tolist()]
+        heapq.heapify(heap)
+        sinks = []
+
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if sinks and distance > column_distance[sinks[0]]:
+                break
+            if node < num_supply_nodes:
+                i = node
+                if row_done[i] or distance > row_distance[i]:
+                    continue
+                row_done[i] = True
+                arcs = problem.row_lanes(i)
+                columns = problem.arc_endpoints(arcs)[1]
+                distances = distance + costs[arcs] + row_potentials[i] - column_potentials[columns]
+                better = (distances < column_distance[columns]) & ~column_done[columns]
+                columns, distances = columns[better], distances[better]
+                column_distance[columns] = distances
+                column_predecessor[columns] = arcs[better]
+                for j, column_key in zip(columns.tolist(), distances.tolist()):
+                    heapq.heappush(heap, (column_key, num_supply_nodes + j))
+            else:
+                j = node - num_supply_nodes
+                if column_done[j] or distance > column_distance[j]:
+                    continue
+                column_done[j] = True
+                if deficit[j] > self.tolerance:
+                    sinks.append(j)
+                    continue
+                arcs = problem.column_lanes(j)
+                arcs = arcs[flows[arcs] > self.tolerance]
+                rows = problem.arc_endpoints(arcs)[0]
+                distances = distance - (costs[arcs] + row_potentials[rows] - column_potentials[j])
+                better = (distances < row_distance[rows]) & ~row_done[rows]
+                rows, distances = rows[better], distances[better]
+                row_distance[rows] = distances
+                row_predecessor[rows] = arcs[better]
+                for i, row_key in zip(rows.tolist(), distances.tolist()):
+                    heapq.heappush(heap, (row_key, i))
+        if not sinks:
+            return None
+        return sinks, row_distance, column_distance, row_predecessor, column_predecessor
+
+    def run(self):
+        problem = self.problem
+        flows = self.flows
+        excess = np.array(problem.supply_values, dtype=float)
+        deficit = np.array(problem.demand_values, dtype=float)
+        self.ship_tight_arcs(excess, deficit)
+        while (excess > self.tolerance).any():
+            found = self.shortest_paths(excess, deficit)
+            if found is None:
+                raise ValueError("The allowed lanes cannot carry a feasible allocation")
+            sinks, row_distance, column_distance, row_predecessor, column_predecessor = found
+
+            # Every sink is at the same shortest distance, so each tree path to one is a shortest path; augment
+            # along those that an earlier augmentation this round has not blocked (source row drained or a reverse
+            # arc emptied)
+            for sink in sinks:
+                # Trace the path back to a source row: forward arcs into columns, reverse arcs into rows
+                forward_arcs, reverse_arcs = [], []
+                column = sink
+                while True:
+                    arc = int(column_predecessor[column])
+                    forward_arcs.append(arc)
+                    row = problem.arc_cell(arc)[0]
+                    if row_predecessor[row] == -1:
+                        break
+                    arc = int(row_predecessor[row])
+                    reverse_arcs.append(arc)
+                    column = problem.arc_cell(arc)[1]
+
+                amount = min(excess[row], deficit[sink], *(flows[arc] for arc in reverse_arcs))
+                if amount <= self.tolerance:
+                    continue
+                for arc in forward_arcs:
+                    flows[arc] += amount
+                for arc in reverse_arcs:
+                    flows[arc] -= amount
+                excess[row] -= amount
+                deficit[sink] -= amount
+                self.augmentations += 1
+
+            sink_distance = column_distance[sinks[0]]
+            self.row_potentials += np.minimum(row_distance, sink_distance)
+            self.column_potentials += np.minimum(column_distance, sink_distance)
+
+        # u is stored negated (see calculate_shadow_prices), so u = p_row and v = p_column, with u[0] = 0
+        problem.u_values = (self.row_potentials - self.row_potentials[0]).tolist()
+        problem.v_values = (self.column_potentials - self.row_potentials[0]).tolist()
+
+
+class AuctionSolver:
+    # Bertsekas-style auction with epsilon scaling, in its min-cost flow (epsilon-relaxation) form. Rows bid for
+    # columns and columns with more than their demand give back their worst bids, with prices such that
+    # c + row_price - column_price >= -epsilon on every usable cell. Rows never interact with each other, so all
+    # unassigned rows bid at once in one vectorized step; overfull columns are then settled one column at a time.
+    # Costs are scaled by m + n + 1, which makes the last phase (epsilon = 1) exact for integer costs. Excesses
+    # within the problem's flow_tolerance count as settled, and max_rounds (default 100 (m + n)^2 over all
+    # phases) bounds the bidding so a run that fails to settle raises instead of hanging.
+    def __init__(self, problem, scaling_factor=4, max_rounds=None):
+        self.problem = problem
+        self.scaling_factor = scaling_factor
+        self.num_nodes = problem.num_supply_nodes + problem.num_demand_nodes
+        self.max_rounds = 100 * self.num_nodes ** 2 if max_rounds is None else max_rounds
+        costs = problem.cost_matrix
+        self.integral = np.issubdtype(costs.dtype, np.integer)
+        self.costs = costs.astype(np.int64 if self.integral else float) * (self.num_nodes + 1)
+        self.row_prices = np.zeros(problem.num_supply_nodes, dtype=self.costs.dtype)
+        self.column_prices = np.zeros(problem.num_demand_nodes, dtype=self.costs.dtype)
+        self.rounds = 0
+
+    def refine(self, epsilon):
+        costs = self.costs
+        tolerance = self.problem.flow_tolerance
+        supply = np.asarray(self.problem.supply_values)
+        demand = np.asarray(self.problem.demand_values)
+        flows = np.zeros(costs.shape, dtype=supply.dtype)
+        row_excess = supply.copy()
+        column_excess = -demand
+        row_prices, column_prices = self.row_prices, self.column_prices
+        # Restart from an empty assignment; row prices are set so every cell has a non-negative reduced cost
+        row_prices[:] = (column_prices[np.newaxis, :] - costs).max(axis=1)
+
+        while True:
+            self.rounds += 1
+            if self.rounds > self.max_rounds:
+                raise ValueError(f"The auction did not settle within {self.max_rounds} rounds")
+            bidders = np.flatnonzero(row_excess > tolerance)
+            if bidders.size:
+                values = column_prices[np.newaxis, :] - costs[bidders]
+                best_columns = values.argmax(axis=1)
+                best_values = values[np.arange(bidders.size), best_columns]
+                # rows with no admissible cell relabel to one epsilon below their best value
+                outbid = best_values <= row_prices[bidders]
+                row_prices[bidders[outbid]] = best_values[outbid] - epsilon
+                flows[bidders, best_columns] += row_excess[bidders]
+                np.add.at(column_excess, best_columns, row_excess[bidders])
+                row_excess[bidders] = 0
+
+            overfull = np.flatnonzero(column_excess > tolerance)
+            if not overfull.size:
+                break
+            for j in overfull:
+                holders = np.flatnonzero(flows[:, j])
+                keys = row_prices[holders] + costs[holders, j]
+                excess = column_excess[j]
+                price = column_prices[j]
+                # give back the worst bids first; a column relabels whenever its remaining bids are all admissible-free
+                for k in np.argsort(-keys, kind="stable"):
+                    if keys[k] <= price:
+                        price = keys[k] - epsilon
+                    i = holders[k]
+                    amount = min(excess, flows[i, j])
+                    flows[i, j] -= amount
+                    row_excess[i] += amount
+                    excess -= amount
+                    if excess <= tolerance:
+                        break
+                column_prices[j] = price
+                column_excess[j] = 0
+
+        return flows
+
+    def run(self):
+        epsilon = max(np.abs(self.costs).max(), 1)
+        while True:
+            epsilon = max(epsilon // self.scaling_factor if self.integral else epsilon / self.scaling_factor, 1)
+            flows = self.refine(epsilon)
+            if epsilon == 1:
+                break
+
+        problem = self.problem
+        problem.allocations[:] = flows
+        scale = self.num_nodes + 1
+        # u is stored negated (see calculate_shadow_prices): u = row price, v = column price, shifted so u[0] = 0
+        problem.u_values = ((self.row_prices - self.row_prices[0]) / scale).tolist()
+        problem.v_values = ((self.column_prices - self.row_prices[0]) / scale).tolist()
+
+
+class SinkhornSolver:
+    # Entropic-regularized transport solved with log-domain Sinkhorn iterations, for instances too large to pivot.
+    # The fractional plan is rounded to an integral feasible one, and a dual lower bound (the c-transform of the
+    # row potentials) bounds how far it can be from the optimum. The regularization starts coarse and is divided
+    # by annealing_factor until it reaches the target, each stage warm-started from the previous potentials.
+    # Rows are processed in chunks of about chunk_size cells, so no temporary grows with the problem size; the
+    # cost matrix is used as is (integer costs are promoted chunk by chunk) and the plan is rounded straight into
+    # the problem's allocations.
+    def __init__(self, problem, regularization=None, tolerance=1e-4, max_iterations=1000, annealing_factor=4,
+                 chunk_size=1 << 22):
+        self.problem = problem
+        self.costs = problem.cost_matrix
+        self.spread = max(self.costs.max() - self.costs.min(), 1.0)
+        self.target_regularization = regularization if regularization is not None else self.spread / 1000
+        self.annealing_factor = annealing_factor
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.rows_per_chunk = max(1, chunk_size // max(problem.num_demand_nodes, 1))
+        self.iteration = 0
+        self.lower_bound = None
+
+    def chunks(self):
+        num_rows = self.problem.num_supply_nodes
+        for first_row in range(0, num_rows, self.rows_per_chunk):
+            yield slice(first_row, min(first_row + self.rows_per_chunk, num_rows))
+
+    def row_log_sums(self, g):
+        # log sum_j exp((g_j - c_ij) / reg) for every row i
+        sums = np.empty(self.problem.num_supply_nodes)
+        for rows in self.chunks():
+            exponents = (g[np.newaxis, :] - self.costs[rows]) / self.regularization
+            peak = exponents.max(axis=1)
+            sums[rows] = peak + np.log(np.exp(exponents - peak[:, np.newaxis]).sum(axis=1))
+        return sums
+
+    def column_log_sums(self, f):
+        # log sum_i exp((f_i - c_ij) / reg) for every column j, accumulated chunk by chunk
+        peak = np.full(self.problem.num_demand_nodes, -np.inf)
+        total = np.zeros(self.problem.num_demand_nodes)
+        for rows in self.chunks():
+            exponents = (f[rows, np.newaxis] - self.costs[rows]) / self.regularization
+            new_peak = np.maximum(peak, exponents.max(axis=0))
+            total = total * np.exp(peak - new_peak) + np.exp(exponents - new_peak).sum(axis=0)
+            peak = new_peak
+        return peak + np.log(total)
+
+    def transport_plan(self, f, g, rows):
+        return np.exp((f[:, np.newaxis] + g[np.newaxis, :] - self.costs[rows]) / self.regularization)
+
+    def run(self):
+        problem = self.problem
+        supply = np.asarray(problem.supply_values, dtype=float)
+        demand = np.asarray(problem.demand_values, dtype=float)
+        with np.errstate(divide="ignore"):
+            log_supply, log_demand = np.log(supply), np.log(demand)
+        f = np.zeros(problem.num_supply_nodes)
+        g = np.zeros(problem.num_demand_nodes)
+
+        self.regularization = max(self.spread / 10, self.target_regularization)
+        while True:
+            # Alternate exact row and column scalings; after a row update the row sums match, so only the column
+            # marginals need checking
+            reg = self.regularization
+            while self.iteration < self.max_iterations:
+                self.iteration += 1
+                f = reg * (log_supply - self.row_log_sums(g))
+                column_log_sums = self.column_log_sums(f)
+                if np.abs(np.exp(g / reg + column_log_sums) - demand).sum() <= self.tolerance * demand.sum():
+                    break
+                g = reg * (log_demand - column_log_sums)
+            if reg <= self.target_regularization or self.iteration >= self.max_iterations:
+                break
+            self.regularization = max(reg / self.annealing_factor, self.target_regularization)
+
+        self.round_plan(f, g, supply, demand)
+
+        # u_i + v_j <= c_ij with v the c-transform of the row potentials, so this is a valid lower bound
+        v = np.full(problem.num_demand_nodes, np.inf)
+        for rows in self.chunks():
+            v = np.minimum(v, (self.costs[rows] - f[rows, np.newaxis]).min(axis=0))
+        shipping = supply > 0
+        self.lower_bound = float(supply[shipping] @ f[shipping] + demand @ v)
+        # rows without supply got f = -inf; give them their own c-transform so the duals stay finite
+        idle = ~shipping
+        f[idle] = (self.costs[idle] - v[np.newaxis, :]).min(axis=1)
+        # u is stored negated (see calculate_shadow_prices)
+        problem.u_values = (-f).tolist()
+        problem.v_values = v.tolist()
+
+    def round_plan(self, f, g, supply, demand):
+        # Shrink the plan so it fits within both marginals, floor it into the problem's allocations, and route the
+        # remaining integral supply row by row over the columns with the lowest reduced cost c - f - g. The plan is
+        # rebuilt chunk by chunk: a first pass gets the row scaling and the column sums after it, a second pass
+        # applies both scalings and floors.
+        row_scale = np.empty(self.problem.num_supply_nodes)
+        column_sums = np.zeros(self.problem.num_demand_nodes)
+        for rows in self.chunks():
+            plan = self.transport_plan(f[rows], g, rows)
+            row_scale[rows] = np.minimum(1.0, supply[rows] / np.maximum(plan.sum(axis=1), 1e-300))
+            column_sums += (plan * row_scale[rows, np.newaxis]).sum(axis=0)
+        column_scale = np.minimum(1.0, demand / np.maximum(column_sums, 1e-300))
+
+        allocations = self.problem.allocations
+        for rows in self.chunks():
+            plan = self.transport_plan(f[rows], g, rows)
+            plan *= row_scale[rows, np.newaxis]
+            plan *= column_scale[np.newaxis, :]
+            allocations[rows] = np.floor(plan)
+
+        row_residual = np.asarray(self.problem.supply_values) - allocations.sum(axis=1)
+        column_residual = np.asarray(self.problem.demand_values) - allocations.sum(axis=0)
+        route_residuals(allocations, self.costs, row_residual, column_residual, g)
+        return allocations
+
+
+# Batched IFS: the same rules as the TransportationProblem methods applied to a stack of same-shape balanced
+# instances at once. costs is (B, m, n), supply (B, m) and demand (B, n); every step advances all instances
+# together with NumPy operations along the batch axis. Each rule returns the allocations and a boolean mask of the
+# cells the rule made basic (zero allocations included), which set_initial_solution() takes as is.
+
+def batch_northwest_corner_rule(costs, supply, demand):
+    num_instances, num_supply_nodes, num_demand_nodes = costs.shape
+    batch = np.arange(num_instances)
+    allocations = np.zeros(costs.shape, dtype=np.result_type(supply, demand))
+    basis = np.zeros(costs.shape, dtype=bool)
+    remaining_supply, remaining_demand = supply.copy(), demand.copy()
+    i = np.zeros(num_instances, dtype=int)
+    j = np.zeros(num_instances, dtype=int)
+    active = np.ones(num_instances, dtype=bool)
+
+    while active.any():
+        b, ib, jb = batch[active], i[active], j[active]
+        allocation = np.minimum(remaining_supply[b, ib], remaining_demand[b, jb])
+        allocations[b, ib, jb] = allocation
+        basis[b, ib, jb] = True
+        remaining_supply[b, ib] -= allocation
+        remaining_demand[b, jb] -= allocation
+
+        next_row = (remaining_supply[b, ib] == 0) & (ib < num_supply_nodes - 1)
+        next_column = ~next_row & (remaining_demand[b, jb] == 0) & (jb < num_demand_nodes - 1)
+        i[b[next_row]] += 1
+        j[b[next_column]] += 1
+        active[b[~next_row & ~next_column]] = False
+
+    return allocations, basis
+
+
+def batch_minimum_cost_rule(costs, supply, demand):
+    num_instances, num_supply_nodes, num_demand_nodes = costs.shape
+    batch = np.arange(num_instances)
+    allocations = np.zeros(costs.shape, dtype=np.result_type(supply, demand))
+    basis = np.zeros(costs.shape, dtype=bool)
+    remaining_supply, remaining_demand = supply.copy(), demand.copy()
+    costs = costs.astype(float)
+    closed = np.finfo(float).max
+
+    while True:
+        active = remaining_supply.any(axis=1) & remaining_demand.any(axis=1)
+        if not active.any():
+            break
+        b = batch[active]
+        # argmin over the flattened matrix picks the first cheapest cell, as np.argmin(axis=None) does
+        i, j = np.divmod(costs[b].reshape(b.size, -1).argmin(axis=1), num_demand_nodes)
+        allocation = np.minimum(remaining_supply[b, i], remaining_demand[b, j])
+        allocations[b, i, j] = allocation
+        basis[b, i, j] = True
+        remaining_supply[b, i] -= allocation
+        remaining_demand[b, j] -= allocation
+
+        row_done = remaining_supply[b, i] == 0
+        column_done = remaining_demand[b, j] == 0
+        costs[b[row_done], i[row_done], :] = closed
+        costs[b[column_done], :, j[column_done]] = closed
+
+    return allocations, basis
+
+
+def batch_vogel_approximation_method(costs, supply, demand):
+    num_instances, num_supply_nodes, num_demand_nodes = costs.shape
+    batch = np.arange(num_instances)
+    allocations = np.zeros(costs.shape, dtype=np.result_type(supply, demand))
+    basis = np.zeros(costs.shape, dtype=bool)
+    remaining_supply, remaining_demand = supply.copy(), demand.copy()
+    costs = costs.astype(float)
+    closed = np.finfo(float).max
+
+    while True:
+        active = remaining_supply.any(axis=1) & remaining_demand.any(axis=1)
+        if not active.any():
+            break
+        b = batch[active]
+        active_costs = costs[b]
+        # Row penalties first, then column penalties, so argmax breaks ties the way max() does on the list
+        penalties = np.concatenate([
+            np.where(remaining_supply[b] > 0, smallest_cost_gap(active_costs, axis=2), np.finfo(float).min),
+            np.where(remaining_demand[b] > 0, smallest_cost_gap(active_costs, axis=1), np.finfo(float).min),
+        ], axis=1)
+        line = penalties.argmax(axis=1)
+        by_row = line < num_supply_nodes
+        i = np.where(by_row, line, 0)
+        j = np.where(by_row, 0, line - num_supply_nodes)
+        i[~by_row] = active_costs[~by_row, :, j[~by_row]].argmin(axis=1)
+        j[by_row] = active_costs[by_row, i[by_row], :].argmin(axis=1)
+
+        allocation = np.minimum(remaining_supply[b, i], remaining_demand[b, j])
+        allocations[b, i, j] = allocation
+        basis[b, i, j] = True
+        remaining_supply[b, i] -= allocation
+        remaining_demand[b, j] -= allocation
+
+        row_done = remaining_supply[b, i] == 0
+        column_done = remaining_demand[b, j] == 0
+        costs[b[row_done], i[row_done], :] = closed
+        costs[b[column_done], :, j[column_done]] = closed
+
+    return allocations, basis
+
+
+def smallest_cost_gap(costs, axis):
+    # Difference between the two smallest costs along an axis (the VAM penalty); zero when there is only one
+    if costs.shape[axis] < 2:
+        return np.zeros(np.delete(costs.shape, axis))
+    smallest = np.partition(costs, 1, axis=axis)
+    return np.take(smallest, 1, axis=axis) - np.take(smallest, 0, axis=axis)
+
+
+BATCH_IFS_METHODS = {
+    "NWCR": batch_northwest_corner_rule,
+    "MCR": batch_minimum_cost_rule,
+    "VA": batch_vogel_approximation_method,
+}
+
+
+def batch_initial_feasible_solutions(costs, supply, demand, ifs="NWCR"):
+    if ifs not in BATCH_IFS_METHODS:
+        raise ValueError(f"Unknown IFS method: {ifs}")
+    costs, supply, demand = np.asarray(costs), np.asarray(supply), np.asarray(demand)
+    if costs.ndim != 3 or supply.shape != costs.shape[:2] or demand.shape != (costs.shape[0], costs.shape[2]):
+        raise ValueError("Expected costs of shape (B, m, n), supply of shape (B, m) and demand of shape (B, n)")
+    if (supply.sum(axis=1) != demand.sum(axis=1)).any():
+        raise ValueError("Batched instances must be balanced (total supply equal to total demand)")
+    return BATCH_IFS_METHODS[ifs](costs, supply, demand)
+
+
+def solve_batch(costs, supply, demand, ifs="VA", pricing="dantzig", engine="modi", max_iterations=None):
+    # Batched IFS for the whole stack, then the usual per-instance optimization from it; one Solution per instance.
+    # Nested lists work as well as arrays.
+    costs, supply, demand = np.asarray(costs), np.asarray(supply), np.asarray(demand)
+    allocations, basis = batch_initial_feasible_solutions(costs, supply, demand, ifs)
+    solutions = []
+    for k in range(len(allocations)):
+        start_time = time.perf_counter()
+        problem = TransportationProblem(costs.shape[1], costs.shape[2], list(supply[k]), list(demand[k]),
+                                        list(costs[k]))
+        problem.set_initial_solution(allocations[k], basis[k])
+        solutions.append(problem.reoptimize(pricing, engine, max_iterations))
+        solutions[-1].elapsed = time.perf_counter() - start_time
+    return solutions
+
+
+def solve_many(problems, workers=None, chunk_size=None, **solve_options):
+    # Solve independent problems in a process pool; solve_options go to each problem's solve(). Problems are sent
+    # to the workers in chunks to amortize the pickling round trips, and the Solutions come back in input order,
+    # each with the time its own solve took. The problems passed in are not modified.
+    problems = list(problems)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(problems) <= 1:
+        # in process, so solve copies to leave the inputs as they were (the pool path gets pickled copies anyway)
+        return [solve_one(copy.deepcopy(problem), solve_options) for problem in problems]
+    if chunk_size is None:
+        # a few chunks per worker keeps the pool balanced when instance sizes vary
+        chunk_size = max(1, math.ceil(len(problems) / (4 * workers)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(solve_one, problems, [solve_options] * len(problems), chunksize=chunk_size))
+
+
+def solve_one(problem, solve_options):
+    return problem.solve(**solve_options)
+
+
+def solve_portfolio(problem, methods=None, timeout=None, **solve_options):
+    # Race the same problem from several IFS methods, one process each; the first run to reach optimality wins and
+    # the others are terminated. The winning Solution records its method in Solution.ifs. solve_options go to
+    # solve(), whose engine must start from an IFS ("modi", the default here, or "network"). If every run stops
+    # short of optimality (max_iterations) the cheapest of them is returned. timeout bounds the whole race in
+    # seconds; TimeoutError is raised when it runs out.
+    engine = solve_options.setdefault("engine", "modi")
+    if engine not in ("modi", "network"):
+        raise ValueError(f"solve_portfolio() needs an IFS-based engine (modi or network), not {engine}")
+    methods = list(methods or TransportationProblem.IFS_METHODS)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=portfolio_worker, args=(problem, ifs, solve_options, results),
+                                         daemon=True) for ifs in methods]
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    for process in processes:
+        process.start()
+    try:
+        errors, stopped = [], []
+        while len(errors) + len(stopped) < len(methods):
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            try:
+                ifs, outcome = results.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"No portfolio run finished within {timeout} seconds") from None
+            if isinstance(outcome, Exception):
+                errors.append(outcome)
+            elif not outcome.optimal:
+                stopped.append(outcome)
+            else:
+                return outcome
+        if stopped:
+            return min(stopped, key=lambda solution: solution.total_cost)
+        raise errors[0]
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+
+def portfolio_worker(problem, ifs, solve_options, results):
+    try:
+        results.put((ifs, problem.solve(ifs=ifs, **solve_options)))
+    except Exception as error:
+        results.put((ifs, error))
+
+
+def route_residuals(allocations, costs, row_residual, column_residual, column_prices=None):
+    # Ship the remaining supply row by row over the cheapest columns that still need units (the residuals must
+    # have equal totals); allocations and both residual arrays are updated in place. With column_prices the columns
+    # are ranked by c_ij - column_prices[j], i.e. by reduced cost, since a row's own price does not change its order.
+    for i in np.flatnonzero(row_residual > 0):
+        open_columns = np.flatnonzero(column_residual > 0)
+        row_costs = costs[i, open_columns]
+        if column_prices is not None:
+            row_costs = row_costs - column_prices[open_columns]
+        open_columns = open_columns[np.argsort(row_costs, kind="stable")]
+        capacity = column_residual[open_columns]
+        # fill cheapest first: each column takes what is left of the row residual after the cheaper ones
+        shipped = np.clip(row_residual[i] - (np.cumsum(capacity) - capacity), 0, capacity)
+        allocations[i, open_columns] += shipped
+        column_residual[open_columns] -= shipped
+        row_residual[i] = 0
+
+
+def shortest_augmenting_path(costs):
+    # Jonker-Volgenant style O(n^3) shortest augmenting path for a rows <= columns cost matrix. Rows are added one
+    # at a time and matched along a shortest alternating path, with the inner scan over columns vectorized.
+    # Returns the column of each row and duals with u + v <= c, tight on the assignment.
+    num_rows, num_columns = costs.shape
+    u = np.zeros(num_rows + 1)
+    v = np.zeros(num_columns + 1)
+    # 1-based: row_of[j] is the row matched to column j, column 0 is the virtual start of each search
+    row_of = np.zeros(num_columns + 1, dtype=int)
+    way = np.zeros(num_columns + 1, dtype=int)
+    for i in range(1, num_rows + 1):
+        row_of[0] = i
+        j0 = 0
+        min_reduced = np.full(num_columns + 1, np.inf)
+        used = np.zeros(num_columns + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = row_of[j0]
+            reduced = costs[i0 - 1] - u[i0] - v[1:]
+            update = ~used[1:] & (reduced < min_reduced[1:])
+            min_reduced[1:][update] = reduced[update]
+            way[1:][update] = j0
+            candidates = np.where(used[1:], np.inf, min_reduced[1:])
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[row_of[used]] += delta
+            v[used] -= delta
+            min_reduced[~used] -= delta
+            j0 = j1
+            if row_of[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            row_of[j0] = row_of[j1]
+            j0 = j1
+
+    assigned = np.zeros(num_rows, dtype=int)
+    for j in range(1, num_columns + 1):
+        if row_of[j]:
+            assigned[row_of[j] - 1] = j - 1
+    return assigned.tolist(), u[1:], v[1:]
+
+
+def tree_path(adjacency, start, target):
+    # Arcs of the path from target back to start in a forest given as {neighbour: arc} dicts, or None
+    parent = {start: None}
+    stack = [start]
+    while stack and target not in parent:
+        node = stack.pop()
+        for neighbour, arc in adjacency[node].items():
+            if neighbour not in parent:
+                parent[neighbour] = (node, arc)
+                stack.append(neighbour)
+    if target not in parent:
+        return None
+    path = []
+    node = target
+    while parent[node] is not None:
+        node, arc = parent[node]
+        path.append(arc)
+    return path
+
+
+def restore_basis(problem, u_values=None, v_values=None):
+    # Make a feasible flow basic: positive arcs that close a cycle have the cycle cancelled towards the cheaper
+    # direction (free for an optimal flow), then the forest is completed into a spanning tree with zero arcs,
+    # taking arcs that are tight under the given duals first so the tree keeps those duals
+    flows, costs = problem.flow_vector(), problem.cost_vector()
+    num_supply_nodes = problem.num_supply_nodes
+    adjacency = [{} for _ in range(num_supply_nodes + problem.num_demand_nodes)]
+    for arc in np.flatnonzero(flows > 0).tolist():
+        i, j = problem.arc_cell(arc)
+        row_node, column_node = i, num_supply_nodes + j
+        path = tree_path(adjacency, row_node, column_node)
+        if path is not None:
+            # Same orientation as identify_loop: the arc is +, the path from its column node alternates -, +, ...
+            signs = [-1 if k % 2 == 0 else 1 for k in range(len(path))]
+            cycle_cost = costs[arc] + sum(sign * costs[path_arc] for sign, path_arc in zip(signs, path))
+            direction = 1 if cycle_cost <= 0 else -1
+            cycle = [(arc, direction)] + [(path_arc, sign * direction) for sign, path_arc in zip(signs, path)]
+            theta = min(flows[cycle_arc] for cycle_arc, sign in cycle if sign < 0)
+            leaving = next(cycle_arc for cycle_arc, sign in cycle if sign < 0 and flows[cycle_arc] == theta)
+            for cycle_arc, sign in cycle:
+                flows[cycle_arc] += sign * theta
+            if leaving == arc:
+                continue
+            leaving_row, leaving_column = problem.arc_cell(leaving)
+            del adjacency[leaving_row][num_supply_nodes + leaving_column]
+            del adjacency[num_supply_nodes + leaving_column][leaving_row]
+        adjacency[row_node][column_node] = arc
+        adjacency[column_node][row_node] = arc
+
+    basic_arcs = [arc for node in range(num_supply_nodes) for arc in adjacency[node].values()]
+    if u_values is not None:
+        parent = list(range(len(adjacency)))
+
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for arc in basic_arcs:
+            i, j = problem.arc_cell(arc)
+            parent[find(i)] = find(num_supply_nodes + j)
+        num_components = sum(1 for node in range(len(parent)) if find(node) == node)
+        deltas = problem.arc_deltas(np.asarray(u_values), np.asarray(v_values))
+        for arc in np.flatnonzero(np.abs(deltas) <= problem.cost_tolerance).tolist():
+            if num_components == 1:
+                break
+            i, j = problem.arc_cell(arc)
+            root_i, root_j = find(i), find(num_supply_nodes + j)
+            if root_i != root_j:
+                parent[root_i] = root_j
+                basic_arcs.append(arc)
+                num_components -= 1
+
+    problem.set_basic_arcs(basic_arcs)
+    problem.complete_basis()
+
+
+NUMERIC_MODES = ("int64", "float64")
+
+
+def numeric_mode(dtype, *values):
+    # int64 keeps integer data exact; float64 is for fractional data and compares with a tolerance. Without an
+    # explicit dtype the mode follows the data: int64 when every value is stored as an integer.
+    if dtype is None:
+        integral = all(np.asarray(value).dtype.kind in "biu" for value in values)
+        return np.dtype(np.int64 if integral else np.float64)
+    dtype = np.dtype(dtype)
+    if dtype.name not in NUMERIC_MODES:
+        raise ValueError(f"Unsupported numeric mode: {dtype.name} (use one of {', '.join(NUMERIC_MODES)})")
+    if dtype.kind == "i":
+        for value in values:
+            value = np.asarray(value, dtype=float)
+            if not np.array_equal(value, np.round(value)):
+                raise ValueError("int64 mode needs integral supply, demand and cost values; use float64")
+    return dtype
+
+
+def comparison_tolerance(dtype, tolerance, values):
+    # Absolute tolerance for comparisons in the given mode: zero for int64 (exact), otherwise the relative
+    # tolerance (default 1e-9) scaled by the magnitude of the values compared
+    if dtype.kind == "i":
+        return 0
+    values = np.asarray(values, dtype=float)
+    scale = np.abs(values).max() if values.size else 0.0
+    return (1e-9 if tolerance is None else tolerance) * max(scale, 1.0)
+
+
+PRICING_RULES = {
+    "dantzig": DantzigPricing,
+    "first": FirstImprovingPricing,
+    "block": BlockPricing,
+    "candidate": CandidateListPricing,
+}
+
+
+def make_pricing_rule(pricing):
+    if isinstance(pricing, str):
+        if pricing not in PRICING_RULES:
+            raise ValueError(f"Unknown pricing rule: {pricing}")
+        return PRICING_RULES[pricing]()
+    return pricing
 
 
 class CustomCell(tk.Frame):
@@ -351,7 +2616,11 @@ class TableauGUI(tk.Tk):
         self.transportation_problem = transportation_problem
         self.state = 0
 
-        self.states = [self.transportation_problem.generate_state()]
+        # iteration reached after each click (None before the initial solution); the solutions themselves are
+        # rebuilt from the problem's IterationHistory
+        self.steps = [None]
+        # step events of the solve shown in the tableau (see TransportationProblem.iter_steps)
+        self.step_events = None
 
         # Add a new variable to hold the selected IFS
         self.selected_ifs = tk.StringVar(value="NWCR")
@@ -377,6 +2646,9 @@ class TableauGUI(tk.Tk):
         ifs_menu.add_radiobutton(label='NWCR', variable=self.selected_ifs, command=self.change_ifs)
         ifs_menu.add_radiobutton(label='MCR', variable=self.selected_ifs, command=self.change_ifs)
         ifs_menu.add_radiobutton(label='VA', variable=self.selected_ifs, command=self.change_ifs)
+        ifs_menu.add_radiobutton(label='RA', variable=self.selected_ifs, command=self.change_ifs)
+        ifs_menu.add_radiobutton(label='RMR', variable=self.selected_ifs, command=self.change_ifs)
+        ifs_menu.add_radiobutton(label='CMR', variable=self.selected_ifs, command=self.change_ifs)
         algorithm_menu.add_cascade(label='IFS', menu=ifs_menu)
 
         # create the View menu
@@ -414,6 +2686,13 @@ class TableauGUI(tk.Tk):
                                   column=transportation_problem.num_demand_nodes + 2,
                                   padx=5, pady=5)
 
+        # Starting cost of the chosen IFS next to the current cost, so the IFS methods can be compared
+        self.starting_cost = None
+        self.cost_label = ttk.Label(self, text="", font=("Arial", 18), foreground="blue", background="lightgray")
+        self.cost_label.grid(row=transportation_problem.num_supply_nodes + 7,
+                             column=transportation_problem.num_demand_nodes + 2,
+                             padx=5, pady=5)
+
     def open_data(self):
         pass
 
@@ -462,6 +2741,8 @@ class TableauGUI(tk.Tk):
     def change_ifs(self):
         self.transportation_problem.reset()
         self.show_initial_solution()
+        # the new IFS starts a new history, so the steps back go to this initial solution and then to the empty tableau
+        self.steps = [None, 0]
 
     def screenshot(self):
         x = self.winfo_rootx()
@@ -708,17 +2989,22 @@ class TableauGUI(tk.Tk):
 
     def update_iteration_count(self):
         self.iteration_label['text'] = f"Iteration: {self.transportation_problem.iteration}"
+        if self.starting_cost is not None:
+            self.cost_label['text'] = (f"Cost: {self.transportation_problem.total_cost()} "
+                                       f"(start: {self.starting_cost})")
 
     def previous_step(self):
-        if len(self.states) > 1:
-            self.states.pop()
-            previous_state = self.states[-1]
+        if len(self.steps) > 1:
+            self.steps.pop()
+            iteration = self.steps[-1]
 
             # Restore the previous state
-            self.transportation_problem.allocations = previous_state.allocations
-            self.transportation_problem.u_values = previous_state.u_values
-            self.transportation_problem.v_values = previous_state.v_values
-            self.transportation_problem.iteration = previous_state.iteration
+            if iteration is None:
+                self.transportation_problem.reset()
+            else:
+                self.transportation_problem.restore_iteration(iteration)
+            # the event stream cannot rewind, so the next step starts a new one from the restored solution
+            self.step_events = None
 
             self.clear_cells()
             self.clear_shadow_prices()
@@ -743,42 +3029,48 @@ class TableauGUI(tk.Tk):
             self.show_updated_solution()
 
         self.update_iteration_count()  # update the iteration count on the GUI after each step
-        self.states.append(self.transportation_problem.generate_state())  # Save the current state before proceeding
+        self.steps.append(self.transportation_problem.iteration)  # Save the current step before proceeding
+
+    def next_event(self, event_type):
+        # Next event of the given type from the solve; after a step back the stream restarts from the restored
+        # solution and the events before the wanted one are recomputed and skipped. None once optimal.
+        if self.step_events is None:
+            self.step_events = self.transportation_problem.iter_steps(ifs=None)
+        for event in self.step_events:
+            if isinstance(event, event_type):
+                return event
+        return None
 
     def show_initial_solution(self):
-        if self.selected_ifs.get() == 'NWCR':
-            self.transportation_problem.northwest_corner_rule()
-        elif self.selected_ifs.get() == 'MCR':
-            self.transportation_problem.minimum_cost_rule()
-        elif self.selected_ifs.get() == 'VA':
-            self.transportation_problem.vogel_approximation_method()
+        self.step_events = self.transportation_problem.iter_steps(self.selected_ifs.get())
+        event = next(self.step_events)
+        self.transportation_problem.start_history()
+        self.starting_cost = event.total_cost
+        self.update_iteration_count()
 
         self.create_tableau(show_allocations=True)
         self.state = 1
 
-        self.transportation_problem.calculate_shadow_prices()
-
     def show_shadow_prices_opportunity_costs(self):
-        self.transportation_problem.u_values, self.transportation_problem.v_values = self.transportation_problem.calculate_shadow_prices()
+        self.next_event(DualsComputedEvent)
         self.create_tableau(show_allocations=True, show_shadow_prices=True, show_opportunity_costs=True)
         self.state = 2
 
     def show_loop(self):
-        pivot_cell = self.transportation_problem.find_pivot_cell()
-        loop = self.transportation_problem.identify_loop(pivot_cell)
-        self.create_tableau(show_allocations=True, show_shadow_prices=True, show_opportunity_costs=True, loop=loop)
+        event = self.next_event(PivotChosenEvent)
+        if event is None:
+            # the duals on screen are optimal: no improving cell, so there is no loop to show
+            self.create_tableau(show_allocations=True, show_shadow_prices=True, show_opportunity_costs=True)
+            self.next_button.config(state="disabled")
+            return
+        self.create_tableau(show_allocations=True, show_shadow_prices=True, show_opportunity_costs=True,
+                            loop=event.loop)
         self.state = 3
 
     def show_updated_solution(self):
-        pivot_cell = self.transportation_problem.find_pivot_cell()
-        loop = self.transportation_problem.identify_loop(pivot_cell)
-        if loop:
-            self.transportation_problem.update_allocations(loop)
+        self.next_event(AllocationsUpdatedEvent)
         self.create_tableau(show_allocations=True, show_shadow_prices=True, show_opportunity_costs=True)
-        if self.transportation_problem.has_positive_deltas():
-            self.state = 1
-        else:
-            self.next_button.config(state="disabled")
+        self.state = 1
 
 
 def get_inputs():
@@ -913,8 +3205,9 @@ class Introduction:
             pygame.display.flip()
             clock.tick(60)
 
-intro = Introduction()
-intro.run()
+if __name__ == "__main__":
+    intro = Introduction()
+    intro.run()
 
 
 class Menu:
@@ -1012,7 +3305,10 @@ class Menu:
                 - CHANGE: Modify the current problem data.
             - IFS: Select the Initial Feasible Solution (IFS) method.
                    Options include NWCR (Northwest Corner Rule), MCR 
-                   (Minimum Cost Rule), or VA (Vogel's Approximation).
+                   (Minimum Cost Rule), VA (Vogel's Approximation), RA
+                   (Russell's Approximation), RMR (Row Minimum Rule) or
+                   CMR (Column Minimum Rule). The starting cost and the
+                   current cost are shown next to the iteration count.
 
         3. VIEW MENU:
             - SCREENSHOT: Captures a screenshot of the current state of 
@@ -1084,5 +3380,6 @@ class Menu:
         self.running = False
 
 
-menu = Menu()
-menu.display()
+if __name__ == "__main__":
+    menu = Menu()
+    menu.display()
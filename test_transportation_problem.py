@@ -0,0 +1,620 @@
+import numpy as np
+import pytest
+
+from Hitchcock_Trasnportation_Problem import (
+    BATCH_IFS_METHODS,
+    PRICING_RULES,
+    AllocationsUpdatedEvent,
+    AuctionSolver,
+    DualsComputedEvent,
+    InitialSolutionEvent,
+    PivotChosenEvent,
+    SparseTransportationProblem,
+    SuccessiveShortestPath,
+    TransportationProblem,
+    batch_initial_feasible_solutions,
+    restore_basis,
+    solve_batch,
+    solve_many,
+    solve_portfolio,
+)
+
+
+# The sample exercise from Report.md; its optimal cost is 830
+SAMPLE_SUPPLY = [40, 30, 30]
+SAMPLE_DEMAND = [60, 20, 20]
+SAMPLE_COSTS = [[16, 10, 2], [12, 4, 6], [9, 7, 5]]
+SAMPLE_OPTIMUM = 830
+
+
+def sample_problem(**options):
+    # fresh lists every time: balance_problem() appends to them
+    return TransportationProblem(3, 3, list(SAMPLE_SUPPLY), list(SAMPLE_DEMAND), [row[:] for row in SAMPLE_COSTS],
+                                 **options)
+
+
+@pytest.mark.parametrize("ifs", ["NWCR", "MCR", "VA"])
+def test_solve_sample(ifs):
+    problem = sample_problem()
+    solution = problem.solve(ifs)
+    assert solution.optimal
+    assert solution.total_cost == problem.total_cost() == SAMPLE_OPTIMUM
+    np.testing.assert_array_equal(solution.allocations.sum(axis=1), SAMPLE_SUPPLY)
+    np.testing.assert_array_equal(solution.allocations.sum(axis=0), SAMPLE_DEMAND)
+
+
+def test_solve_unbalanced_ships_the_excess_to_a_balancing_node():
+    problem = TransportationProblem(2, 2, [30, 20], [10, 25], [[4, 6], [5, 3]])
+    solution = problem.solve("MCR")
+    assert solution.allocations.shape == (2, 3)
+    assert solution.allocations[:, 2].sum() == 15
+    assert solution.total_cost == 10 * 4 + 5 * 6 + 20 * 3
+
+
+def test_shadow_prices_price_the_basic_cells_at_their_cost():
+    problem = sample_problem()
+    problem.solve()
+    u_values, v_values = problem.calculate_shadow_prices()
+    # u is stored negated, so a basic cell has v_j - u_i = c_ij
+    assert u_values[0] == 0
+    for i, j in zip(*np.nonzero(problem.allocations)):
+        assert v_values[j] - u_values[i] == SAMPLE_COSTS[i][j]
+
+
+def test_loop_alternates_between_rows_and_columns_through_basic_cells():
+    problem = sample_problem()
+    problem.initial_feasible_solution("NWCR")
+    problem.u_values, problem.v_values = problem.calculate_shadow_prices()
+    pivot = problem.find_pivot_cell()
+    loop = problem.identify_loop(pivot)
+    assert loop[0] == pivot and len(loop) >= 4 and len(loop) % 2 == 0
+    assert all(problem.allocations[cell] > 0 for cell in loop[1:])
+    same_row = [a[0] == b[0] for a, b in zip(loop, loop[1:] + loop[:1])]
+    same_column = [a[1] == b[1] for a, b in zip(loop, loop[1:] + loop[:1])]
+    assert all(row != column for row, column in zip(same_row, same_column))
+    assert all(a != b for a, b in zip(same_row, same_row[1:]))
+
+
+def random_instances(count, min_size=3, max_size=9, max_cost=12, seed=0):
+    # balanced integer instances; the small cost range makes ties common and some demands start at zero
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        m, n = (int(k) for k in rng.integers(min_size, max_size, 2))
+        supply = rng.integers(1, 20, m)
+        demand = rng.multinomial(int(supply.sum()), np.full(n, 1 / n))
+        yield supply, demand, rng.integers(1, max_cost, (m, n))
+
+
+def make_problem(supply, demand, costs, **options):
+    return TransportationProblem(len(supply), len(demand), list(supply), list(demand), list(costs), **options)
+
+
+def test_degenerate_solutions_keep_a_full_basis():
+    for supply, demand, costs in random_instances(60):
+        optima = set()
+        for ifs in ("NWCR", "MCR", "VA"):
+            problem = make_problem(supply, demand, costs)
+            solution = problem.solve(ifs)
+            assert len(problem.basis) == len(supply) + len(demand) - 1
+            assert all(problem.allocations[cell] == 0 for cell in zip(*np.nonzero(problem.allocations == 0))
+                       if cell not in problem.basis)
+            np.testing.assert_array_equal(solution.allocations.sum(axis=1), supply)
+            np.testing.assert_array_equal(solution.allocations.sum(axis=0), demand)
+            optima.add(solution.total_cost)
+        assert len(optima) == 1
+
+
+def test_optimal_solution_has_no_improving_cell():
+    for supply, demand, costs in random_instances(30, seed=1):
+        problem = make_problem(supply, demand, costs)
+        problem.solve()
+        problem.u_values, problem.v_values = problem.calculate_shadow_prices()
+        deltas = problem.price_all_cells()
+        assert not problem.has_positive_deltas()
+        assert (deltas <= 0).all()
+        assert all(deltas[cell] == 0 for cell in problem.basis)
+
+
+@pytest.mark.parametrize("pricing", sorted(PRICING_RULES))
+@pytest.mark.parametrize("ifs", sorted(TransportationProblem.IFS_METHODS))
+def test_sample_every_ifs_and_pricing(ifs, pricing):
+    solution = sample_problem().solve(ifs, pricing)
+    assert solution.optimal
+    assert solution.total_cost == SAMPLE_OPTIMUM
+
+
+@pytest.mark.parametrize("pricing", sorted(PRICING_RULES))
+def test_pricing_rules_reach_the_same_optimum(pricing):
+    for supply, demand, costs in random_instances(30, seed=2):
+        reference = make_problem(supply, demand, costs).solve(pricing="dantzig")
+        assert make_problem(supply, demand, costs).solve(pricing=pricing).total_cost == reference.total_cost
+
+
+def assert_engine_matches_modi(engine, instances):
+    for supply, demand, costs in instances:
+        reference = make_problem(supply, demand, costs).solve(engine="modi")
+        problem = make_problem(supply, demand, costs)
+        solution = problem.solve(engine=engine)
+        assert solution.total_cost == problem.total_cost() == reference.total_cost
+        assert len(problem.basis) == problem.num_supply_nodes + problem.num_demand_nodes - 1
+
+
+def test_network_engine():
+    assert sample_problem().solve(engine="network").total_cost == SAMPLE_OPTIMUM
+    assert_engine_matches_modi("network", random_instances(40, seed=3))
+
+
+def sparse_sample_problem(lanes=range(9)):
+    rows, columns = np.divmod(np.array(list(lanes)), 3)
+    return SparseTransportationProblem(3, 3, list(SAMPLE_SUPPLY), list(SAMPLE_DEMAND), rows, columns,
+                                       np.asarray(SAMPLE_COSTS)[rows, columns])
+
+
+@pytest.mark.parametrize("ifs", sorted(SparseTransportationProblem.IFS_METHODS))
+def test_sparse_sample(ifs):
+    assert sparse_sample_problem().solve(ifs).total_cost == SAMPLE_OPTIMUM
+
+
+def test_missing_lane_is_a_forbidden_route():
+    # without the cheap S1 -> D3 lane the optimum is the dense one with that lane priced out
+    costs = [row[:] for row in SAMPLE_COSTS]
+    costs[0][2] = 10 ** 6
+    dense = TransportationProblem(3, 3, list(SAMPLE_SUPPLY), list(SAMPLE_DEMAND), costs).solve()
+    problem = sparse_sample_problem(lane for lane in range(9) if lane != 2)
+    assert problem.solve().total_cost == dense.total_cost
+
+
+def test_ssp_engine():
+    assert sample_problem().solve(engine="ssp").total_cost == SAMPLE_OPTIMUM
+    assert sparse_sample_problem().solve(engine="ssp").total_cost == SAMPLE_OPTIMUM
+    assert_engine_matches_modi("ssp", random_instances(40, seed=4))
+
+
+def test_assignment_engine():
+    rng = np.random.default_rng(1)
+    for size in (3, 6, 15):
+        costs = rng.integers(1, 50, (size, size))
+        assert_engine_matches_modi("assignment", [([1] * size, [1] * size, costs)])
+        assert make_problem([1] * size, [1] * size, costs).is_assignment()
+    assert not sample_problem().is_assignment()
+
+
+def test_auction_engine():
+    assert sample_problem().solve(engine="auction").total_cost == SAMPLE_OPTIMUM
+    assert_engine_matches_modi("auction", random_instances(40, seed=5))
+
+
+def test_approximate_solution_is_feasible_and_bounded():
+    solution = sample_problem().solve_approximate(polish_iterations=0)
+    assert not solution.optimal
+    assert solution.lower_bound <= SAMPLE_OPTIMUM + 1e-6 <= solution.total_cost + 1e-6
+    assert solution.gap == solution.total_cost - solution.lower_bound
+    np.testing.assert_array_equal(solution.allocations.sum(axis=1), SAMPLE_SUPPLY)
+    np.testing.assert_array_equal(solution.allocations.sum(axis=0), SAMPLE_DEMAND)
+
+
+@pytest.mark.parametrize("engine", ["modi", "network"])
+def test_reoptimize_after_cost_changes_matches_a_cold_solve(engine):
+    rng = np.random.default_rng(6)
+    for supply, demand, costs in random_instances(40, seed=6):
+        problem = make_problem(supply, demand, costs)
+        problem.solve()
+        changed = costs.copy()
+        for _ in range(3):
+            i, j = int(rng.integers(len(supply))), int(rng.integers(len(demand)))
+            changed[i, j] = rng.integers(1, 12)
+            problem.update_cost(i, j, int(changed[i, j]))
+        solution = problem.reoptimize(engine=engine)
+        assert solution.optimal
+        assert solution.total_cost == make_problem(supply, demand, changed).solve().total_cost
+
+
+def test_reoptimize_needs_a_solved_problem():
+    with pytest.raises(ValueError):
+        sample_problem().reoptimize()
+
+
+@pytest.mark.parametrize("change", ["add supply", "add demand", "remove supply", "remove demand"])
+def test_node_changes_reoptimize_to_a_fresh_optimum(change):
+    rng = np.random.default_rng(7)
+    for supply, demand, costs in random_instances(30, max_size=7, seed=7):
+        m, n = costs.shape
+        problem = make_problem(supply, demand, costs)
+        problem.solve()
+        supply, demand = list(supply), list(demand)
+        if change == "add supply":
+            new_row = rng.integers(1, 12, n)
+            supply.append(int(rng.integers(1, 20)))
+            problem.add_supply_node(supply[-1], list(new_row))
+            costs = np.vstack([costs, new_row])
+        elif change == "add demand":
+            new_column = rng.integers(1, 12, m)
+            demand.append(int(rng.integers(1, 20)))
+            problem.add_demand_node(demand[-1], list(new_column))
+            costs = np.hstack([costs, new_column[:, np.newaxis]])
+        elif change == "remove supply" and m > 1:
+            problem.remove_supply_node(0)
+            supply, costs = supply[1:], costs[1:]
+        elif change == "remove demand" and n > 1:
+            problem.remove_demand_node(0)
+            demand, costs = demand[1:], costs[:, 1:]
+        assert problem.reoptimize().total_cost == make_problem(supply, demand, costs).solve().total_cost
+
+
+@pytest.mark.parametrize("ifs", sorted(BATCH_IFS_METHODS))
+def test_batched_ifs_matches_sequential(ifs):
+    for shape_seed in range(10):
+        rng = np.random.default_rng(shape_seed)
+        num_instances, m, n = 12, *(int(k) for k in rng.integers(1, 8, 2))
+        supply = rng.integers(1, 20, (num_instances, m))
+        demand = np.stack([rng.multinomial(int(total), np.full(n, 1 / n)) for total in supply.sum(axis=1)])
+        costs = rng.integers(1, 12, (num_instances, m, n))
+        allocations, basis = batch_initial_feasible_solutions(costs, supply, demand, ifs)
+        for k in range(num_instances):
+            problem = make_problem(supply[k], demand[k], costs[k])
+            problem.initial_feasible_solution(ifs)
+            np.testing.assert_array_equal(allocations[k], problem.allocations)
+            assert set(zip(*np.nonzero(allocations[k]))) <= problem.basis
+
+
+def test_solve_batch_reaches_the_optimum():
+    costs = np.array([SAMPLE_COSTS] * 4)
+    supply, demand = np.array([SAMPLE_SUPPLY] * 4), np.array([SAMPLE_DEMAND] * 4)
+    assert [solution.total_cost for solution in solve_batch(costs, supply, demand)] == [SAMPLE_OPTIMUM] * 4
+
+
+def test_solve_many_keeps_the_input_order():
+    instances = list(random_instances(9, seed=8))
+    solutions = solve_many([make_problem(*instance) for instance in instances], workers=2, chunk_size=2)
+    assert [solution.total_cost for solution in solutions] == \
+        [make_problem(*instance).solve().total_cost for instance in instances]
+    assert all(solution.elapsed is not None for solution in solutions)
+
+
+def test_cost_ranges_bound_the_optimal_basis():
+    problem = sample_problem()
+    problem.solve()
+    report = problem.sensitivity_analysis()
+    allocations = problem.allocations.copy()
+    for i in range(3):
+        for j in range(3):
+            for cost, still_optimal in ((report.cost_lower[i][j], True), (report.cost_upper[i][j], True),
+                                        (report.cost_lower[i][j] - 1, False), (report.cost_upper[i][j] + 1, False)):
+                if not np.isfinite(cost) or cost < 0:
+                    continue
+                costs = [row[:] for row in SAMPLE_COSTS]
+                costs[i][j] = int(cost)
+                optimum = TransportationProblem(3, 3, list(SAMPLE_SUPPLY), list(SAMPLE_DEMAND), costs).solve()
+                kept = (allocations * np.array(costs)).sum()
+                assert (optimum.total_cost == kept) == still_optimal
+
+
+def test_supply_and_demand_ranges_move_the_cost_at_the_shadow_price():
+    problem = sample_problem()
+    problem.solve()
+    report = problem.sensitivity_analysis()
+    for i in range(3):
+        if report.supply_upper[i] >= SAMPLE_SUPPLY[i] + 1:
+            supply, demand = list(SAMPLE_SUPPLY), list(SAMPLE_DEMAND)
+            supply[i] += 1
+            demand[0] += 1  # the partner node of every supply value is D1
+            solution = TransportationProblem(3, 3, supply, demand, [row[:] for row in SAMPLE_COSTS]).solve()
+            assert solution.total_cost == SAMPLE_OPTIMUM + report.supply_prices[i]
+    for j in range(3):
+        if report.demand_upper[j] >= SAMPLE_DEMAND[j] + 1:
+            supply, demand = list(SAMPLE_SUPPLY), list(SAMPLE_DEMAND)
+            demand[j] += 1
+            supply[0] += 1  # the partner node of every demand value is S1
+            solution = TransportationProblem(3, 3, supply, demand, [row[:] for row in SAMPLE_COSTS]).solve()
+            assert solution.total_cost == SAMPLE_OPTIMUM + report.demand_prices[j]
+
+
+def test_parametric_segments_match_solves_along_the_direction():
+    direction = np.array([[-3, 2, 1], [1, -2, 0], [2, 1, -1]])
+    problem = sample_problem()
+    problem.solve()
+    segments = problem.parametric_analysis(direction, lambda_max=6)
+    assert segments[0].start == 0 and segments[-1].end == 6
+    assert all(a.end == b.start for a, b in zip(segments, segments[1:]))
+    for step in range(7):
+        costs = np.array(SAMPLE_COSTS) + step * direction
+        optimum = TransportationProblem(3, 3, list(SAMPLE_SUPPLY), list(SAMPLE_DEMAND), list(costs)).solve()
+        segment = next(segment for segment in segments if segment.start <= step <= segment.end)
+        assert segment.cost_at(step) == pytest.approx(optimum.total_cost)
+
+
+# Sequential references: rescan every open line after each allocation, as the rules were first written
+
+def reference_vogel_approximation_method(supply, demand, costs):
+    allocations = np.zeros(costs.shape, dtype=int)
+    supply, demand, costs = supply.copy(), demand.copy(), costs.astype(float)
+    m, n = costs.shape
+    while supply.any() and demand.any():
+        penalties = []
+        for i in range(m):
+            low, high = np.partition(costs[i], 1)[:2] if n > 1 else (costs[i, 0], costs[i, 0])
+            penalties.append((high - low if supply[i] > 0 else np.finfo(float).min, i, -1))
+        for j in range(n):
+            low, high = np.partition(costs[:, j], 1)[:2] if m > 1 else (costs[0, j], costs[0, j])
+            penalties.append((high - low if demand[j] > 0 else np.finfo(float).min, -1, j))
+        _, i, j = max(penalties, key=lambda penalty: penalty[0])
+        if i == -1:
+            i = int(np.argmin(costs[:, j]))
+        else:
+            j = int(np.argmin(costs[i]))
+        allocations[i, j] = allocation = min(supply[i], demand[j])
+        supply[i] -= allocation
+        demand[j] -= allocation
+        if supply[i] == 0:
+            costs[i, :] = np.finfo(float).max
+        if demand[j] == 0:
+            costs[:, j] = np.finfo(float).max
+    return allocations
+
+
+def assert_matches_reference(ifs, reference):
+    for supply, demand, costs in random_instances(150, min_size=1):
+        problem = make_problem(supply, demand, costs)
+        problem.initial_feasible_solution(ifs)
+        np.testing.assert_array_equal(problem.allocations, reference(supply, demand, costs))
+        assert len(problem.basis) == len(supply) + len(demand) - 1
+
+
+def test_incremental_vogel_matches_sequential():
+    assert_matches_reference("VA", reference_vogel_approximation_method)
+
+
+def reference_minimum_cost_rule(supply, demand, costs):
+    allocations = np.zeros(costs.shape, dtype=int)
+    supply, demand, costs = supply.copy(), demand.copy(), costs.astype(float)
+    while supply.any() and demand.any():
+        i, j = np.unravel_index(np.argmin(costs), costs.shape)
+        allocations[i, j] = allocation = min(supply[i], demand[j])
+        supply[i] -= allocation
+        demand[j] -= allocation
+        if supply[i] == 0:
+            costs[i, :] = np.finfo(float).max
+        if demand[j] == 0:
+            costs[:, j] = np.finfo(float).max
+    return allocations
+
+
+def test_sort_once_minimum_cost_rule_matches_sequential():
+    assert_matches_reference("MCR", reference_minimum_cost_rule)
+
+
+def reference_russell_approximation_method(supply, demand, costs):
+    allocations = np.zeros(costs.shape, dtype=int)
+    supply, demand, costs = supply.copy(), demand.copy(), costs.astype(float)
+    while supply.any() and demand.any():
+        open_cells = (supply > 0)[:, np.newaxis] & (demand > 0)[np.newaxis, :]
+        open_costs = np.where(open_cells, costs, -np.inf)
+        u, v = open_costs.max(axis=1), open_costs.max(axis=0)
+        deltas = np.where(open_cells, costs - u[:, np.newaxis] - v[np.newaxis, :], np.inf)
+        i, j = np.unravel_index(np.argmin(deltas), deltas.shape)
+        allocations[i, j] = allocation = min(supply[i], demand[j])
+        supply[i] -= allocation
+        demand[j] -= allocation
+    return allocations
+
+
+def test_russell_approximation_matches_its_definition():
+    assert_matches_reference("RA", reference_russell_approximation_method)
+
+
+def test_compare_initial_solutions_covers_every_method():
+    results = sample_problem().compare_initial_solutions()
+    assert set(results) == set(TransportationProblem.IFS_METHODS)
+    assert all(cost >= SAMPLE_OPTIMUM and pivots >= 0 for cost, pivots in results.values())
+    assert results["NWCR"][0] == 40 * 16 + 20 * 12 + 10 * 4 + 10 * 7 + 20 * 5
+
+
+def test_portfolio_returns_an_optimal_run_and_its_method():
+    solution = solve_portfolio(sample_problem(), methods=["NWCR", "MCR", "VA"], engine="modi")
+    assert solution.optimal
+    assert solution.total_cost == SAMPLE_OPTIMUM
+    assert solution.ifs in ("NWCR", "MCR", "VA")
+
+
+@pytest.mark.parametrize("engine", ["modi", "network"])
+def test_float64_mode_solves_fractional_data(engine):
+    problem = TransportationProblem(3, 3, [s / 4 for s in SAMPLE_SUPPLY], [d / 4 for d in SAMPLE_DEMAND],
+                                    [[c / 2 for c in row] for row in SAMPLE_COSTS])
+    assert problem.dtype == np.float64
+    assert problem.solve(engine=engine).total_cost == pytest.approx(SAMPLE_OPTIMUM / 8)
+
+
+def test_numeric_modes():
+    assert sample_problem().dtype == np.int64
+    assert sample_problem(dtype="float64").solve().total_cost == SAMPLE_OPTIMUM
+    with pytest.raises(ValueError):
+        TransportationProblem(1, 1, [1.5], [1.5], [[1]], dtype="int64")
+    with pytest.raises(ValueError):
+        sample_problem(dtype="float32")
+
+
+def test_history_restores_every_iteration():
+    supply, demand, costs = next(random_instances(1, max_size=12, max_cost=40, seed=9))
+    problem = make_problem(supply, demand, costs)
+    problem.initial_feasible_solution("NWCR")
+    problem.start_history(checkpoint_interval=3)
+    snapshots = [(problem.allocations.copy(), set(problem.basis))]
+    while True:
+        problem.u_values, problem.v_values = problem.calculate_shadow_prices()
+        pivot, delta = problem.price_and_pick()
+        if delta <= 0:
+            break
+        problem.update_allocations(problem.identify_loop(pivot))
+        snapshots.append((problem.allocations.copy(), set(problem.basis)))
+    assert len(snapshots) > 4
+    for iteration in reversed(range(len(snapshots))):
+        problem.restore_iteration(iteration)
+        np.testing.assert_array_equal(problem.allocations, snapshots[iteration][0])
+        assert problem.basis == snapshots[iteration][1]
+    with pytest.raises(ValueError):
+        problem.restore_iteration(1)
+
+
+def test_step_events_walk_the_modi_method():
+    problem = sample_problem()
+    events = list(problem.iter_steps("NWCR"))
+    kinds = [type(event) for event in events]
+    assert kinds[0] is InitialSolutionEvent and kinds[-1] is DualsComputedEvent
+    assert kinds[1:-1] == [DualsComputedEvent, PivotChosenEvent, AllocationsUpdatedEvent] * ((len(events) - 2) // 3)
+    assert problem.total_cost() == SAMPLE_OPTIMUM
+    for chosen, updated in zip(events[2::3], events[3::3]):
+        assert chosen.delta > 0 and chosen.loop[0] == chosen.cell
+        assert updated.loop == chosen.loop and updated.leaving in chosen.loop
+
+
+FRACTIONAL_SUPPLY = [1.9, 1.1]
+FRACTIONAL_DEMAND = [0.3, 2.1, 1.1, 2.5, 1.0, 1.9]
+FRACTIONAL_COSTS = [[4.5, 2.25, 7.0, 1.5, 3.75, 6.0], [2.0, 5.5, 1.25, 4.0, 6.5, 3.0]]
+
+
+def fractional_problem():
+    # the float balancing dummy leaves a one-ulp gap between total supply and total demand
+    return TransportationProblem(2, 6, list(FRACTIONAL_SUPPLY), list(FRACTIONAL_DEMAND),
+                                 [row[:] for row in FRACTIONAL_COSTS])
+
+
+def test_auction_settles_fractional_data_within_the_tolerance():
+    reference = fractional_problem().solve(engine="network")
+    assert fractional_problem().solve(engine="auction").total_cost == pytest.approx(reference.total_cost)
+
+
+def test_auction_round_cap_raises():
+    with pytest.raises(ValueError):
+        AuctionSolver(fractional_problem(), max_rounds=1).run()
+
+
+def test_ssp_settles_fractional_data_within_the_tolerance():
+    reference = fractional_problem().solve(engine="network")
+    assert fractional_problem().solve(engine="ssp").total_cost == pytest.approx(reference.total_cost)
+
+
+def test_ssp_potentials_are_optimal_duals_on_wider_cost_ranges():
+    # wider costs make ties rare, so most searches settle a single sink; flows must sit on tight cells only
+    for supply, demand, costs in random_instances(20, max_size=30, max_cost=1000, seed=9):
+        problem = make_problem(supply, demand, costs)
+        problem.reset()
+        SuccessiveShortestPath(problem).run()
+        reduced_costs = costs + np.subtract.outer(problem.u_values, problem.v_values)
+        assert reduced_costs.min() >= -1e-9
+        assert np.all(reduced_costs[problem.allocations > 0] <= 1e-9)
+        assert problem.total_cost() == make_problem(supply, demand, costs).solve(engine="network").total_cost
+
+
+def test_update_cost_keeps_int64_mode_integral():
+    problem = sample_problem()
+    with pytest.raises(ValueError):
+        problem.update_cost(0, 0, 3.7)
+    assert problem.cost_matrix[0, 0] == SAMPLE_COSTS[0][0]
+
+
+def test_restore_basis_takes_duals_tight_within_the_problem_tolerance():
+    # duals that are off by less than the configured tolerance must still pick the tree, so they come back as given
+    rng = np.random.default_rng(23)
+    for supply, demand, costs in random_instances(30, seed=23):
+        problem = make_problem(supply, demand, costs / 7, dtype="float64", tolerance=1e-6)
+        problem.solve(engine="network")
+        u_values = np.array(problem.u_values) + rng.uniform(-1e-8, 1e-8, len(supply))
+        v_values = np.array(problem.v_values) + rng.uniform(-1e-8, 1e-8, len(demand))
+        restore_basis(problem, u_values, v_values)
+        restored_u, restored_v = problem.calculate_shadow_prices()
+        np.testing.assert_allclose(np.subtract.outer(restored_u, restored_v), np.subtract.outer(u_values, v_values),
+                                   atol=1e-7)
+
+
+def test_solve_many_in_process_leaves_the_inputs_alone():
+    problem = sample_problem()
+    assert solve_many([problem], workers=1)[0].total_cost == SAMPLE_OPTIMUM
+    assert not problem.allocations.any() and not problem.basis
+
+
+def test_portfolio_records_the_method_on_assignment_instances():
+    costs = np.random.default_rng(2).integers(1, 50, (5, 5))
+    solution = solve_portfolio(make_problem([1] * 5, [1] * 5, costs), methods=["NWCR", "VA"])
+    assert solution.ifs in ("NWCR", "VA")
+    with pytest.raises(ValueError):
+        solve_portfolio(sample_problem(), engine="auto")
+
+
+def test_portfolio_timeout_raises_timeout_error():
+    supply, demand, costs = next(random_instances(1, min_size=80, max_size=81, max_cost=1000, seed=22))
+    with pytest.raises(TimeoutError):
+        solve_portfolio(make_problem(supply, demand, costs), timeout=0)
+
+
+def test_update_cost_on_integer_array_rows_reoptimizes_to_the_cold_optimum():
+    # the caller's rows are int arrays that cannot hold the new fractional costs; the duals must still see them
+    rng = np.random.default_rng(13)
+    for supply, demand, costs in random_instances(60, seed=13):
+        rows = list(costs.copy())
+        problem = make_problem(supply, demand, rows, dtype="float64")
+        problem.solve()
+        changed = costs.astype(float)
+        for _ in range(3):
+            i, j = int(rng.integers(len(supply))), int(rng.integers(len(demand)))
+            changed[i, j] = rng.integers(1, 12) + 0.9
+            problem.update_cost(i, j, changed[i, j])
+        solution = problem.reoptimize()
+        assert solution.optimal
+        cold = make_problem(supply, demand, changed, dtype="float64").solve()
+        assert solution.total_cost == pytest.approx(cold.total_cost)
+        np.testing.assert_array_equal(rows, costs)
+
+
+def test_node_changes_chain_through_reoptimize():
+    rng = np.random.default_rng(7)
+    for supply, demand, costs in random_instances(30, max_size=7, seed=7):
+        m, n = costs.shape
+        problem = make_problem(supply, demand, costs)
+        problem.solve()
+        new_row = rng.integers(1, 12, n)
+        supply = list(supply) + [int(rng.integers(1, 20))]
+        problem.add_supply_node(supply[-1], list(new_row))
+        costs = np.vstack([costs, new_row])
+        assert problem.reoptimize().total_cost == make_problem(supply, demand, costs).solve().total_cost
+
+        new_column = rng.integers(1, 12, m + 1)
+        demand = list(demand) + [int(rng.integers(1, 20))]
+        problem.add_demand_node(demand[-1], list(new_column))
+        costs = np.hstack([costs, new_column[:, np.newaxis]])
+        assert problem.reoptimize().total_cost == make_problem(supply, demand, costs).solve().total_cost
+
+        problem.remove_supply_node(0)
+        problem.remove_demand_node(0)
+        supply, demand, costs = supply[1:], demand[1:], costs[1:, 1:]
+        assert problem.reoptimize().total_cost == make_problem(supply, demand, costs).solve().total_cost
+
+
+def test_assignment_engine_rejects_other_instances():
+    with pytest.raises(ValueError):
+        sample_problem().solve(engine="assignment")
+
+
+def test_approximate_solution_is_polished_to_the_optimum():
+    for supply, demand, costs in random_instances(30, seed=12):
+        solution = make_problem(supply, demand, costs).solve_approximate()
+        assert solution.optimal
+        assert solution.total_cost == solution.lower_bound == make_problem(supply, demand, costs).solve().total_cost
+        np.testing.assert_array_equal(solution.allocations.sum(axis=1), supply)
+        np.testing.assert_array_equal(solution.allocations.sum(axis=0), demand)
+
+
+def test_history_checkpoints_keep_only_the_basic_cells():
+    supply, demand, costs = next(random_instances(1, min_size=8, max_size=12, seed=24))
+    problem = make_problem(supply, demand, costs)
+    problem.initial_feasible_solution("NWCR")
+    problem.start_history(checkpoint_interval=1)
+    problem.optimize()
+    assert len(problem.history) > 0
+    assert len(problem.history.checkpoints) == len(problem.history) + 1
+    for rows, columns, values in problem.history.checkpoints.values():
+        assert len(rows) == len(columns) == len(values) == len(supply) + len(demand) - 1
+
+
+def test_solve_batch_takes_nested_lists():
+    solutions = solve_batch([SAMPLE_COSTS] * 2, [SAMPLE_SUPPLY] * 2, [SAMPLE_DEMAND] * 2)
+    assert [solution.total_cost for solution in solutions] == [SAMPLE_OPTIMUM] * 2